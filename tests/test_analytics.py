@@ -0,0 +1,100 @@
+from collections import defaultdict
+import numpy as np
+import pytest
+from thumper import analytics
+from thumper.analytics import record_history, win_rate_by_group, victory_point_distribution, action_frequency_by_round, action_outcome_correlation, performed_before, conflict_order_labels, decode_conflict_order
+from thumper.constants import Constant, Action
+from thumper.stats import ACTION_RANGE
+
+GAME_COUNT = 200
+
+@pytest.fixture(scope="module")
+def games() -> dict[str, np.ndarray]:
+	return record_history(GAME_COUNT, seed=0)
+
+# Performing the Swordmaster early is a dense boolean label, which is grouped with np.bincount
+# Conflict orders are labels of games far above the limit of np.bincount, which are grouped with np.unique
+def _get_labels(games: dict[str, np.ndarray]) -> list[np.ndarray]:
+	labels = [performed_before(games, Action.SWORDMASTER, 4), conflict_order_labels(games)]
+	assert labels[0].dtype == np.bool_
+	assert labels[1].max() >= analytics._BINCOUNT_LIMIT
+	return labels
+
+# Maps each label to the ranks and victory points of the players in its group
+def _get_reference_groups(games: dict[str, np.ndarray], labels: np.ndarray) -> dict:
+	labels = np.broadcast_to(labels, games["rank"].shape)
+	groups = defaultdict(list)
+	for i in range(GAME_COUNT):
+		for j in range(Constant.PLAYER_COUNT):
+			groups[labels[i, j].item()].append((games["rank"][i, j].item(), games["victory_points"][i, j].item()))
+	return groups
+
+def test_win_rate_by_group(games):
+	for labels in _get_labels(games):
+		keys, win_rates, counts = win_rate_by_group(games, labels)
+		groups = _get_reference_groups(games, labels)
+		assert keys.tolist() == sorted(groups)
+		for key, win_rate, count in zip(keys.tolist(), win_rates.tolist(), counts.tolist()):
+			players = groups[key]
+			assert count == len(players)
+			assert win_rate == pytest.approx(sum(rank == 0 for rank, _ in players) / len(players))
+
+def test_victory_point_distribution(games):
+	for labels in _get_labels(games):
+		keys, distribution = victory_point_distribution(games, labels)
+		groups = _get_reference_groups(games, labels)
+		assert keys.tolist() == sorted(groups)
+		assert distribution.shape[1] == games["victory_points"].max() + 1
+		for key, fractions in zip(keys.tolist(), distribution):
+			players = groups[key]
+			for victory_points, fraction in enumerate(fractions.tolist()):
+				assert fraction == pytest.approx(sum(score == victory_points for _, score in players) / len(players))
+
+def test_action_frequency_by_round(games):
+	frequencies = action_frequency_by_round(games)
+	assert frequencies.shape == (Constant.MAX_ROUNDS, len(ACTION_RANGE))
+	for round in range(Constant.MAX_ROUNDS):
+		counts = [sum(games["round_action_counts"][i, round, action].item() for i in range(GAME_COUNT)) for action in range(len(ACTION_RANGE))]
+		assert frequencies[round].tolist() == pytest.approx([count / sum(counts) for count in counts])
+	# The actions of each round add up to the actions of all players
+	assert (games["round_action_counts"].sum(axis=1) == games["action_counts"].sum(axis=1)).all()
+
+def _get_reference_correlation(action_counts: np.ndarray, victory_points: np.ndarray, wins: np.ndarray) -> np.ndarray:
+	correlation = np.zeros((2, action_counts.shape[1]))
+	for i, outcome in enumerate((victory_points, wins)):
+		for action in range(action_counts.shape[1]):
+			if action_counts[:, action].std() > 0:
+				correlation[i, action] = np.corrcoef(action_counts[:, action], outcome)[0, 1]
+	return correlation
+
+def test_action_outcome_correlation(games, monkeypatch):
+	expected = _get_reference_correlation(games["action_counts"].reshape(-1, len(ACTION_RANGE)).astype(np.float64), np.ravel(games["victory_points"]).astype(np.float64), np.ravel(games["rank"]) == 0)
+	assert action_outcome_correlation(games) == pytest.approx(expected, abs=1e-9)
+	# Chunks that do not divide the number of players are combined to the same result
+	monkeypatch.setattr(analytics, "_CHUNK_SIZE", 7)
+	assert action_outcome_correlation(games) == pytest.approx(expected, abs=1e-9)
+
+# Chunks of the largest counts a player can reach keep the float32 sums exact
+def test_action_outcome_correlation_exact():
+	rng = np.random.default_rng(0)
+	# Many chunks of players, whose sums of up to 30 * 30 per player would not be exact in float32 if they were added up in a single chunk
+	game_count = 1 << 16
+	games = {
+		"action_counts": rng.integers(0, 31, (game_count, Constant.PLAYER_COUNT, len(ACTION_RANGE)), dtype=np.int16),
+		"victory_points": rng.integers(0, 31, (game_count, Constant.PLAYER_COUNT), dtype=np.int16),
+		"rank": np.tile(np.arange(Constant.PLAYER_COUNT, dtype=np.int8), (game_count, 1))
+	}
+	games["action_counts"][:, :, 0] = 30
+	expected = _get_reference_correlation(games["action_counts"].reshape(-1, len(ACTION_RANGE)).astype(np.float64), np.ravel(games["victory_points"]).astype(np.float64), np.ravel(games["rank"]) == 0)
+	assert action_outcome_correlation(games) == pytest.approx(expected, abs=1e-12)
+
+def test_labels(games):
+	labels = conflict_order_labels(games)
+	assert labels.shape == (GAME_COUNT, 1)
+	for i in range(GAME_COUNT):
+		assert decode_conflict_order(labels[i, 0]) == games["conflicts"][i].tolist()
+	swordmaster = ACTION_RANGE.index(Action.SWORDMASTER)
+	for round in range(1, Constant.MAX_ROUNDS + 2):
+		first_round = games["first_round"][..., swordmaster]
+		expected = [[0 < first_round[i, j] < round for j in range(Constant.PLAYER_COUNT)] for i in range(GAME_COUNT)]
+		assert performed_before(games, Action.SWORDMASTER, round).tolist() == expected
\ No newline at end of file
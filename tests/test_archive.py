@@ -0,0 +1,48 @@
+import os
+import numpy as np
+from thumper.archive import ARCHIVE_COLUMNS, GameArchive, GameArchiveWriter
+from thumper.game import ThumperGame
+
+SHARD_SIZE = 4
+PLAYER_COLUMNS = ["victory_points", "spice_harvested", "solari_earned", "swordmaster", "palace", "holtzman_shield"]
+
+# Plays the seeded games and returns them along with their columns, the action counts are random
+def _play(seeds: range) -> tuple[list[ThumperGame], dict[str, np.ndarray]]:
+	games = []
+	columns = {name: np.zeros((len(seeds),) + shape, dtype=dtype) for name, (shape, dtype) in ARCHIVE_COLUMNS.items()}
+	rng = np.random.default_rng(seeds.start)
+	for i, seed in enumerate(seeds):
+		game = ThumperGame(seed)
+		game.play()
+		games.append(game)
+		for player in game.players:
+			for name in PLAYER_COLUMNS:
+				columns[name][i, player.index] = getattr(player, name)
+		columns["rank"][i] = game.get_player_ranks()
+		columns["action_counts"][i] = rng.integers(0, 10, columns["action_counts"].shape[1:])
+	return games, columns
+
+# Games are written as shards of SHARD_SIZE games plus a partial one, then appended after them by a new writer
+def test_archive_round_trip(tmp_path):
+	directory = str(tmp_path)
+	first_games, first_columns = _play(range(10))
+	with GameArchiveWriter(directory, shard_size=SHARD_SIZE) as writer:
+		for i, game in enumerate(first_games):
+			writer.add_game(game.players, game.get_player_ranks(), first_columns["action_counts"][i])
+	archive = GameArchive(directory)
+	assert len(archive) == 10
+	assert [len(shard["rank"]) for shard in archive.iter_shards()] == [4, 4, 2]
+	for shard in archive.iter_shards():
+		for column in shard.values():
+			assert isinstance(column, np.memmap)
+	_, second_columns = _play(range(10, 15))
+	with GameArchiveWriter(directory, shard_size=SHARD_SIZE) as writer:
+		writer.add_games(second_columns)
+	# Archives that were opened earlier only include the shards that existed at the time
+	assert len(archive) == 10
+	assert sorted(os.listdir(directory)) == [f"shard-{i:06d}" for i in range(5)]
+	loaded = GameArchive(directory).load()
+	for name, (shape, dtype) in ARCHIVE_COLUMNS.items():
+		assert loaded[name].shape == (15,) + shape
+		assert loaded[name].dtype == dtype
+		assert (loaded[name] == np.concatenate([first_columns[name], second_columns[name]])).all(), name
\ No newline at end of file
@@ -0,0 +1,75 @@
+import random
+import numpy as np
+from thumper.batch import BatchedThumperGame
+from thumper.game import ThumperGame
+
+GAME_COUNT = 50
+
+# Per-player state shared by ThumperPlayer and BatchedThumperGame
+PLAYER_FIELDS = [
+	"spice",
+	"solari",
+	"troops_garrison",
+	"troops_deployed",
+	"influence",
+	"swordmaster",
+	"palace",
+	"holtzman_shield",
+	"agents_left",
+	"victory_points",
+	"turns",
+	"spice_harvested",
+	"solari_earned"
+]
+
+def _play(seed: int) -> tuple[ThumperGame, list[int]]:
+	game = ThumperGame(seed)
+	chooser = random.Random(seed)
+	actions = []
+	while not game.game_ended:
+		action = chooser.choice(game.get_legal_actions())
+		game.apply_unchecked(action)
+		actions.append(action)
+	return game, actions
+
+# Replays seeded games of random legal actions in the batched engine and compares the final state with ThumperGame
+def test_batch_matches_game():
+	seeds = list(range(GAME_COUNT))
+	results = [_play(seed) for seed in seeds]
+	batch = BatchedThumperGame(GAME_COUNT, seeds=seeds)
+	step = 0
+	while not batch.game_ended.all():
+		actions = np.array([actions[step] if step < len(actions) else 0 for _, actions in results], dtype=np.intp)
+		mask = batch.legal_action_mask()
+		for i, (_, game_actions) in enumerate(results):
+			if step < len(game_actions):
+				assert mask[i, game_actions[step]]
+		batch.step(actions)
+		step += 1
+	assert step == max(len(actions) for _, actions in results)
+	ranks = batch.get_player_ranks(np.arange(GAME_COUNT))
+	for i, (game, _) in enumerate(results):
+		assert batch.round[i] == game.round
+		assert [conflict.id for conflict in game.conflicts] == batch.conflicts[i].tolist()
+		for player in game.players:
+			for field in PLAYER_FIELDS:
+				assert getattr(batch, field)[i, player.index] == getattr(player, field), field
+			assert batch.actions[i, player.index].tolist() == list(player.action_type_counts)
+		assert ranks[i].tolist() == game.get_player_ranks()
+# Actions passed as a list or as an array of another integer type are performed like an np.intp array
+def test_step_unchecked_action_types():
+	seeds = list(range(GAME_COUNT))
+	reference = BatchedThumperGame(GAME_COUNT, seeds=seeds)
+	from_list = BatchedThumperGame(GAME_COUNT, seeds=seeds)
+	from_int8 = BatchedThumperGame(GAME_COUNT, seeds=seeds)
+	chooser = np.random.default_rng(0)
+	while not reference.game_ended.all():
+		masks = reference.legal_action_mask()
+		actions = np.array([chooser.choice(np.flatnonzero(mask)) if mask.any() else 0 for mask in masks], dtype=np.intp)
+		reference.step_unchecked(actions)
+		from_list.step_unchecked(actions.tolist())
+		from_int8.step_unchecked(actions.astype(np.int8))
+	for game in (from_list, from_int8):
+		assert game.game_ended.all()
+		assert (game.victory_points == reference.victory_points).all()
+		assert (game.actions == reference.actions).all()
\ No newline at end of file
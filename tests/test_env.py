@@ -0,0 +1,25 @@
+import random
+import numpy as np
+from stable_baselines3.common.preprocessing import get_flattened_obs_dim
+from thumper.env import raw_env, OBSERVATION_FORMATS
+from thumper.observation import get_observation_nvec
+
+GAME_COUNT = 5
+
+# The observations of all formats are members of the declared observation space, including their dtype
+def test_observations_in_space():
+	for observation_format in OBSERVATION_FORMATS:
+		env = raw_env(observation_format=observation_format)
+		chooser = random.Random(0)
+		for seed in range(GAME_COUNT):
+			env.reset(seed=seed)
+			while not env.game.game_ended:
+				for agent in env.agents:
+					assert env.observation_space(agent).contains(env.observe(agent)), observation_format
+				env.step(chooser.choice(np.flatnonzero(env.action_masks()).tolist()))
+
+# SB3 adds up nvec to get the size of the one-hot encoding, which must not overflow even though the observations are int8
+def test_int8_one_hot_size():
+	space = raw_env(observation_format="int8").observation_space("player_0")
+	assert space.dtype == np.int8
+	assert get_flattened_obs_dim(space) == sum(get_observation_nvec())
\ No newline at end of file
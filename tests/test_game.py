@@ -0,0 +1,19 @@
+import random
+from thumper.game import ThumperGame
+
+GAME_COUNT = 50
+
+# Undoing each move of seeded games restores the snapshot, the hash and the random number generator, so applying the move again reaches the same state
+def test_apply_undo():
+	for seed in range(GAME_COUNT):
+		game = ThumperGame(seed)
+		chooser = random.Random(seed)
+		while not game.game_ended:
+			action = chooser.choice(game.get_legal_actions())
+			before = (game.snapshot(), game.get_zobrist_hash(), game.random.getstate())
+			record = game.apply(action)
+			after = (game.snapshot(), game.get_zobrist_hash(), game.random.getstate())
+			game.undo(record)
+			assert (game.snapshot(), game.get_zobrist_hash(), game.random.getstate()) == before
+			game.apply(action)
+			assert (game.snapshot(), game.get_zobrist_hash(), game.random.getstate()) == after
\ No newline at end of file
@@ -0,0 +1,23 @@
+import logging
+import os
+import time
+from thumper.stats import ACTION_RANGE, ActionPlotRenderer
+
+# Seconds to wait for the renderer thread
+TIMEOUT = 30
+
+# A plot that cannot be saved is logged and does not stop the thread from rendering the plots that follow
+def test_failed_render(tmp_path, caplog):
+	values = len(ACTION_RANGE) * [1 / len(ACTION_RANGE)]
+	renderer = ActionPlotRenderer()
+	with caplog.at_level(logging.ERROR, logger="thumper.stats"):
+		renderer.submit(values, os.path.join(tmp_path, "missing", "action_frequency.png"))
+		deadline = time.monotonic() + TIMEOUT
+		while not caplog.records and time.monotonic() < deadline:
+			time.sleep(0.01)
+		assert len(caplog.records) == 1
+		path = os.path.join(tmp_path, "action_frequency.png")
+		renderer.submit(values, path)
+		renderer.close()
+	assert os.path.isfile(path)
+	assert len(caplog.records) == 1
\ No newline at end of file
@@ -0,0 +1,62 @@
+import random
+import numpy as np
+import pytest
+from thumper.constants import Constant
+from thumper.env import raw_env
+from thumper.stats import OutcomeField
+from thumper.vec_env import ThumperVecEnv
+
+GAME_COUNT = 10
+
+# Returns the rewards of each player over a seeded game in raw_env and in ThumperVecEnv, including the final rewards of the latter
+def _get_rewards(end_of_game_rewards: bool, seed: int) -> tuple[list[float], list[float]]:
+	env = raw_env(end_of_game_rewards=end_of_game_rewards)
+	env.reset(seed=seed)
+	vec_env = ThumperVecEnv(1, end_of_game_rewards=end_of_game_rewards, seed=seed)
+	vec_env.reset()
+	chooser = random.Random(seed)
+	env_rewards = np.zeros(Constant.PLAYER_COUNT)
+	vec_env_rewards = np.zeros(Constant.PLAYER_COUNT)
+	done = False
+	while not done:
+		player_index = env.game.current_player_index
+		assert vec_env.game.current_player_index[0] == player_index
+		action = chooser.choice(np.flatnonzero(env.action_masks()).tolist())
+		env.step(action)
+		env_rewards += [env.rewards[agent] for agent in env.agents]
+		_, rewards, dones, infos = vec_env.step(np.array([action]))
+		vec_env_rewards[player_index] += rewards[0]
+		done = dones[0]
+	assert env.game.game_ended
+	vec_env_rewards += infos[0]["final_rewards"]
+	return env_rewards.tolist(), vec_env_rewards.tolist()
+
+# Every player receives the same rewards over a game as in raw_env, not just the player whose turn it was
+def test_rewards_match_env():
+	for end_of_game_rewards in (False, True):
+		for seed in range(GAME_COUNT):
+			env_rewards, vec_env_rewards = _get_rewards(end_of_game_rewards, seed)
+			assert vec_env_rewards == env_rewards, (end_of_game_rewards, seed)
+			if end_of_game_rewards:
+				assert sorted(vec_env_rewards, reverse=True) == raw_env.RANK_REWARDS
+
+# Environments that buffer more than finished_game_limit games drop the oldest ones and warn once, without interrupting the steps
+def test_finished_game_limit():
+	limit = 20
+	env = ThumperVecEnv(16, seed=0, record_outcomes=True)
+	limited_env = ThumperVecEnv(16, seed=0, record_outcomes=True, finished_game_limit=limit)
+	env.reset()
+	limited_env.reset()
+	chooser = np.random.default_rng(0)
+	with pytest.warns(RuntimeWarning) as records:
+		for _ in range(500):
+			actions = np.array([chooser.choice(np.flatnonzero(mask)) for mask in env.action_masks()])
+			env.step(actions)
+			limited_env.step(actions)
+	assert len(records) == 1
+	outcomes = env.get_finished_outcomes().reshape(-1, Constant.PLAYER_COUNT, OutcomeField.COUNT)
+	limited_outcomes = limited_env.get_finished_outcomes().reshape(-1, Constant.PLAYER_COUNT, OutcomeField.COUNT)
+	assert len(outcomes) > limit
+	assert len(limited_outcomes) == limit
+	assert limited_env.dropped_game_count == len(outcomes) - limit
+	assert (limited_outcomes == outcomes[-limit:]).all()
\ No newline at end of file
@@ -0,0 +1,78 @@
+import random
+import pytest
+from thumper.error import ThumperError
+from thumper.game import ThumperGame
+from thumper.transposition import TranspositionTable
+
+GAME_COUNT = 50
+
+def _get_recomputed_hash(game: ThumperGame) -> int:
+	return ThumperGame.from_snapshot(game.snapshot()).get_zobrist_hash()
+
+# The hash that is updated incrementally by each move matches the hash computed from scratch for the same state
+def test_incremental_hash():
+	for seed in range(GAME_COUNT):
+		game = ThumperGame(seed)
+		chooser = random.Random(seed)
+		assert game.get_zobrist_hash() == _get_recomputed_hash(game)
+		while not game.game_ended:
+			game.apply_unchecked(chooser.choice(game.get_legal_actions()))
+			assert game.get_zobrist_hash() == _get_recomputed_hash(game)
+
+# Shuffling the conflicts that have not been revealed yet also updates the hash incrementally
+def test_shuffled_conflicts_hash():
+	for seed in range(GAME_COUNT):
+		game = ThumperGame(seed)
+		chooser = random.Random(seed)
+		while not game.game_ended:
+			game.shuffle_hidden_conflicts()
+			assert game.get_zobrist_hash() == _get_recomputed_hash(game)
+			game.apply_unchecked(chooser.choice(game.get_legal_actions()))
+def test_transposition_store_lookup():
+	table = TranspositionTable(8)
+	assert table.lookup(3) is None
+	assert table.store(3, "a", depth=2)
+	assert len(table) == 1
+	assert table.lookup(3) == "a"
+	assert table.lookup(3, depth=2) == "a"
+	# Entries searched to a lower depth than requested are not returned
+	assert table.lookup(3, depth=3) is None
+	assert (table.hits, table.misses) == (2, 2)
+	table.clear()
+	assert len(table) == 0
+	assert table.lookup(3) is None
+
+# Keys that differ by a multiple of the size share a slot
+def test_transposition_collision():
+	table = TranspositionTable(8)
+	assert table.store(3, "a", depth=3)
+	# A deeper entry of the current search is kept
+	assert not table.store(11, "b", depth=2)
+	assert table.lookup(3) == "a"
+	assert table.lookup(11) is None
+	# An entry that is not deeper than the new one is replaced
+	assert table.store(11, "b", depth=3)
+	assert table.lookup(3) is None
+	assert table.lookup(11) == "b"
+	assert len(table) == 1
+	# The same key is always replaced, regardless of the depth
+	assert table.store(11, "c", depth=0)
+	assert table.lookup(11) == "c"
+
+def test_transposition_generations():
+	table = TranspositionTable(8)
+	assert table.store(3, "a", depth=5)
+	table.new_search()
+	# Entries stored by an earlier search are replaced regardless of their depth
+	assert table.store(11, "b", depth=0)
+	assert table.lookup(11) == "b"
+	assert table.store(4, "c", depth=5)
+	table.new_search()
+	# Looking up an entry moves it to the current search, which protects it again
+	assert table.lookup(4) == "c"
+	assert not table.store(12, "d", depth=0)
+	assert table.lookup(4) == "c"
+
+def test_transposition_size():
+	with pytest.raises(ThumperError):
+		TranspositionTable(0)
\ No newline at end of file
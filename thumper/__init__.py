@@ -1 +1,34 @@
-from .env import env, wrap_env, raw_env
\ No newline at end of file
+import importlib
+import sys
+import types
+
+# The environments depend on PettingZoo and Gymnasium, so they are only imported once they are first accessed
+# This keeps the engine (game, player, constants, conflict) importable with nothing but the standard library and NumPy
+_LAZY_ATTRIBUTES = {
+	"env": ".env",
+	"fast_env": ".env",
+	"wrap_env": ".env",
+	"raw_env": ".env"
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+def __getattr__(name: str):
+	if name not in _LAZY_ATTRIBUTES:
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+	value = getattr(module, name)
+	globals()[name] = value
+	return value
+
+def __dir__() -> list[str]:
+	return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+class _Package(types.ModuleType):
+	# Importing the submodule env would otherwise bind it to the attribute of the package of the same name, hiding the function env
+	def __setattr__(self, name: str, value) -> None:
+		if name in _LAZY_ATTRIBUTES and isinstance(value, types.ModuleType):
+			return
+		super().__setattr__(name, value)
+
+sys.modules[__name__].__class__ = _Package
\ No newline at end of file
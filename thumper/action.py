@@ -1,59 +1,121 @@
-class EnvironmentAction:
-	def __init__(self, action, action_type, action_enum, solari=0, spice=0, garrison=0, enabled=None, enabled_argument=False, argument=None, expand=None, troops_produced=None, deployment_limit=None):
-		self.action = action
+from typing import Final
+import numpy as np
+from .constants import Constant, Action, ActionType, Cost
+
+class ActionDefinition:
+	def __init__(self, action_type, action_enum, solari=0, spice=0, garrison=0, argument=None, troops_produced=None, deployment_limit=None):
 		self.action_type = action_type
 		self.action_enum = action_enum
 		self.solari = solari
 		self.spice = spice
 		self.garrison = garrison
-		self.enabled_check = enabled
-		self.enabled_argument = enabled_argument
 		self.argument = argument
-		self.expand = expand
 		self.troops_produced = troops_produced
 		self.deployment_limit = deployment_limit
 
-	def argument_copy(self, argument):
-		return EnvironmentAction(
-			self.action,
-			self.action_type,
-			self.action_enum,
-			solari=self.solari,
-			spice=self.spice,
-			enabled=self.enabled_check,
-			enabled_argument=self.enabled_argument,
-			argument=argument,
-			troops_produced=self.troops_produced,
-			deployment_limit=self.deployment_limit
-		)
-
-	def enabled(self, game):
-		player = game.current_player
-		enabled = not game.game_ended
-		enabled = enabled and game.current_player.agents_left > 0
-		enabled = enabled and (self.action_enum is None or self.action_enum in game.available_actions)
-		enabled = enabled and (self.action_type is None or self.action_type in player.actions)
-		enabled = enabled and player.spice >= self.spice
-		enabled = enabled and player.solari >= self.solari
-		enabled = enabled and player.troops_garrison >= self.garrison
-		if self.enabled_argument:
-			enabled = enabled and (self.enabled_check is None or self.enabled_check(self.argument))
-		else:
-			enabled = enabled and (self.enabled_check is None or self.enabled_check())
-		enabled = enabled and (self.troops_produced is None or self.deployment_limit is None or self._valid_deployment(game))
-		return enabled
-
-	def perform(self, game):
-		assert self.enabled(game)
-		if self.argument is None:
-			self.action()
-		else:
-			self.action(self.argument)
-
-	def _valid_deployment(self, game):
-		troops_deployed = self.argument
-		if troops_deployed < 0 or troops_deployed > self.deployment_limit:
-			return False
-		if game.current_player.troops_garrison + self.troops_produced < troops_deployed:
-			return False
-		return True
\ No newline at end of file
+def _get_action_definitions() -> list[ActionDefinition]:
+	definitions = [
+		ActionDefinition(ActionType.ECONOMIC, Action.CONSTRUCT_PALACE, solari=Cost.CONSTRUCT_PALACE),
+		ActionDefinition(ActionType.ECONOMIC, Action.HARVESTER),
+		ActionDefinition(ActionType.ECONOMIC, Action.REFINERY),
+		ActionDefinition(ActionType.ECONOMIC, Action.SPICE_SILO)
+	]
+	for amount in range(1, Cost.SELL_MELANGE_MAX + 1):
+		definitions.append(ActionDefinition(ActionType.ECONOMIC, Action.SELL_MELANGE, spice=amount, argument=amount))
+	definitions += [
+		ActionDefinition(ActionType.ECONOMIC, Action.SECURE_CONTRACT),
+		ActionDefinition(ActionType.MILITARY, Action.HOLTZMAN_SHIELD, spice=Cost.HOLTZMAN_SHIELD)
+	]
+	for target in range(1, Constant.PLAYER_COUNT + 1):
+		definitions.append(ActionDefinition(ActionType.MILITARY, Action.STONE_BURNER, spice=Cost.STONE_BURNER, argument=target))
+	for troops in range(Constant.HIRE_MERCENARIES_DEPLOYMENT_LIMIT + 1):
+		definitions.append(ActionDefinition(ActionType.MILITARY, Action.HIRE_MERCENARIES, solari=Cost.HIRE_MERCENARIES, argument=troops, troops_produced=Constant.HIRE_MERCENARIES_TROOPS_PRODUCED, deployment_limit=Constant.HIRE_MERCENARIES_DEPLOYMENT_LIMIT))
+	for troops in range(Constant.QUICK_STRIKE_DEPLOYMENT_LIMIT + 1):
+		definitions.append(ActionDefinition(ActionType.MILITARY, Action.QUICK_STRIKE, argument=troops, troops_produced=Constant.QUICK_STRIKE_TROOPS_PRODUCED, deployment_limit=Constant.QUICK_STRIKE_DEPLOYMENT_LIMIT))
+	definitions.append(ActionDefinition(ActionType.MILITARY, Action.RECRUITMENT_CENTER))
+	for troops in range(Constant.TROOP_TRANSPORTS_DEPLOYMENT_LIMIT + 1):
+		definitions.append(ActionDefinition(ActionType.MILITARY, Action.TROOP_TRANSPORTS, garrison=1, argument=troops, troops_produced=Constant.TROOP_TRANSPORTS_TROOPS_PRODUCED, deployment_limit=Constant.TROOP_TRANSPORTS_DEPLOYMENT_LIMIT))
+	definitions += [
+		ActionDefinition(ActionType.MILITARY, Action.LOOT_VILLAGES),
+		# The Swordmaster requires the solari without actually costing any
+		ActionDefinition(ActionType.POLITICAL, Action.SWORDMASTER, solari=Cost.SWORDMASTER),
+		ActionDefinition(ActionType.POLITICAL, Action.SARDAUKAR, spice=Cost.SARDAUKAR),
+		ActionDefinition(ActionType.POLITICAL, Action.AUDIENCE_WITH_EMPEROR, spice=Cost.AUDIENCE_WITH_EMPEROR)
+	]
+	for troops in range(Constant.MOBILIZATION_DEPLOYMENT_LIMIT + 1):
+		definitions.append(ActionDefinition(ActionType.POLITICAL, Action.MOBILIZATION, solari=Cost.MOBILIZATION, garrison=1, argument=troops, troops_produced=Constant.MOBILIZATION_TROOPS_PRODUCED, deployment_limit=Constant.MOBILIZATION_DEPLOYMENT_LIMIT))
+	definitions.append(ActionDefinition(ActionType.POLITICAL, Action.SEEK_ALLIES, solari=Cost.SEEK_ALLIES))
+	for action_type in ActionType:
+		definitions.append(ActionDefinition(ActionType.POLITICAL, Action.POLITICAL_MANEUVERING, argument=action_type))
+	# Passing is the only action without an action type
+	definitions.append(ActionDefinition(None, None))
+	return definitions
+
+# The action space of the environments consists of indexes into this list
+ACTION_DEFINITIONS: Final[list[ActionDefinition]] = _get_action_definitions()
+ACTION_COUNT: Final[int] = len(ACTION_DEFINITIONS)
+# Bits used for each action in ThumperGame.available_actions
+ACTION_BITS: Final[dict[Action, int]] = {action: 1 << action.value for action in Action}
+ALL_AVAILABLE_ACTIONS: Final[int] = sum(ACTION_BITS.values())
+
+# The following tables map parts of the state of a game to bitmasks of the indexes into ACTION_DEFINITIONS that are legal in it
+def _get_action_mask(predicate) -> int:
+	mask = 0
+	for i, definition in enumerate(ACTION_DEFINITIONS):
+		if predicate(definition):
+			mask |= 1 << i
+	return mask
+
+def _get_requirement_masks(get_requirement) -> list[int]:
+	maximum = max(get_requirement(definition) for definition in ACTION_DEFINITIONS)
+	return [_get_action_mask(lambda definition: get_requirement(definition) <= value) for value in range(maximum + 1)]
+
+def _get_garrison_requirement(definition: ActionDefinition) -> int:
+	if definition.deployment_limit is None:
+		return definition.garrison
+	return max(definition.garrison, definition.argument - definition.troops_produced)
+
+# Indexed by Action, passing is included in the mask of None
+ACTION_ENUM_MASKS: Final[dict[Action | None, int]] = {action: _get_action_mask(lambda definition: definition.action_enum == action) for action in [*Action, None]}
+# Indexed by a bitmask of the action types the player has left, with bit ActionType.value - 1 for each of them
+ACTION_TYPE_MASKS: Final[list[int]] = [_get_action_mask(lambda definition: definition.action_type is None or action_types & (1 << (definition.action_type.value - 1))) for action_types in range(1 << Constant.ACTION_TYPES)]
+# Indexed by the resources of the player, capped at the length of the list minus one
+SPICE_MASKS: Final[list[int]] = _get_requirement_masks(lambda definition: definition.spice)
+SOLARI_MASKS: Final[list[int]] = _get_requirement_masks(lambda definition: definition.solari)
+# Covers both the garrison requirements and the troops available for deployment
+GARRISON_MASKS: Final[list[int]] = _get_requirement_masks(_get_garrison_requirement)
+# Indexed by the index of the targeted player
+STONE_BURNER_MASKS: Final[list[int]] = [_get_action_mask(lambda definition: definition.action_enum == Action.STONE_BURNER and definition.argument == i + 1) for i in range(Constant.PLAYER_COUNT)]
+
+def get_available_action_mask(available_actions: int) -> int:
+	mask = _available_action_masks.get(available_actions)
+	if mask is None:
+		mask = ACTION_ENUM_MASKS[None]
+		for action, bit in ACTION_BITS.items():
+			if available_actions & bit:
+				mask |= ACTION_ENUM_MASKS[action]
+		if len(_available_action_masks) < _AVAILABLE_ACTION_MASK_LIMIT:
+			_available_action_masks[available_actions] = mask
+	return mask
+
+_AVAILABLE_ACTION_MASK_LIMIT: Final[int] = 1 << 16
+_available_action_masks: dict[int, int] = {}
+
+# Returns the indices into ACTION_DEFINITIONS of the bits set in a bitmask returned by ThumperGame.legal_action_bits
+def get_action_indices(legal_actions: int) -> tuple[int, ...]:
+	indices = _action_indices.get(legal_actions)
+	if indices is None:
+		indices = tuple(i for i in range(ACTION_COUNT) if legal_actions >> i & 1)
+		if len(_action_indices) < _ACTION_INDICES_LIMIT:
+			_action_indices[legal_actions] = indices
+	return indices
+
+_ACTION_INDICES_LIMIT: Final[int] = 1 << 16
+_action_indices: dict[int, tuple[int, ...]] = {}
+
+# Converts a bitmask returned by ThumperGame.legal_action_bits into a new int8 array of the shape (ACTION_COUNT,)
+# The array only contains zeros and ones, so it can be viewed as np.bool_ without copying it
+def get_action_mask_array(legal_actions: int) -> np.ndarray:
+	return (np.uint64(legal_actions) >> _ACTION_SHIFTS & 1).astype(np.int8)
+
+_ACTION_SHIFTS: Final[np.ndarray] = np.arange(ACTION_COUNT, dtype=np.uint64)
\ No newline at end of file
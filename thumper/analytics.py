@@ -0,0 +1,208 @@
+import argparse
+import random
+import time
+from typing import Final
+import numpy as np
+from .constants import Constant, Action
+from .action import get_action_indices
+from .game import ThumperGame
+from .error import ThumperError
+from .stats import ACTION_RANGE, ACTION_RANGE_INDICES
+from .archive import ARCHIVE_COLUMNS, GameArchive, GameArchiveWriter
+from .rollout import POLICIES, Policy, get_policy
+
+# Columns of the histories recorded by record_history, which can be stored with GameArchiveWriter(directory, columns=HISTORY_COLUMNS)
+# The analyses below only require the columns they use, so most of them also work on archives written by ThumperStats
+HISTORY_COLUMNS: Final[dict[str, tuple[tuple[int, ...], type]]] = {
+	**ARCHIVE_COLUMNS,
+	# Conflict IDs in the order in which they were resolved
+	"conflicts": ((Constant.MAX_ROUNDS,), np.int8),
+	# Round in which each player first performed each action in ACTION_RANGE, 0 if they never did
+	"first_round": ((Constant.PLAYER_COUNT, len(ACTION_RANGE)), np.int8),
+	# Number of times each action in ACTION_RANGE was performed in each round, by any player
+	"round_action_counts": ((Constant.MAX_ROUNDS, len(ACTION_RANGE)), np.uint8)
+}
+
+# Group labels below this value are counted with np.bincount rather than np.unique
+_BINCOUNT_LIMIT: Final[int] = 1 << 20
+# Number of player games processed at once by action_outcome_correlation
+# A player performs at most 30 actions per game, so the sums of the products of a chunk stay below 2 ** 24 and are exact in float32
+_CHUNK_SIZE: Final[int] = 1 << 14
+
+# Plays n_games games like rollout and records their outcomes and action histories in the columns of HISTORY_COLUMNS
+def record_history(n_games: int, policy: str | Policy | None = None, seed: int | None = None) -> dict[str, np.ndarray]:
+	policy = get_policy(policy)
+	seed_random = random.Random(seed)
+	game = ThumperGame()
+	history = {name: np.zeros((n_games,) + shape, dtype=dtype) for name, (shape, dtype) in HISTORY_COLUMNS.items()}
+	action_count = len(ACTION_RANGE)
+	# Python integers are faster than NumPy scalars for the indexing in the loop
+	action_columns = ACTION_RANGE_INDICES.tolist()
+	for i in range(n_games):
+		game.reset(seed_random.getrandbits(64))
+		history["conflicts"][i] = [conflict.id for conflict in game.conflicts]
+		action_counts = (Constant.PLAYER_COUNT * action_count) * [0]
+		first_round = (Constant.PLAYER_COUNT * action_count) * [0]
+		round_action_counts = (Constant.MAX_ROUNDS * action_count) * [0]
+		while not game.game_ended:
+			legal_actions = game.legal_action_bits()
+			if policy is None:
+				action = game.random.choice(get_action_indices(legal_actions))
+			else:
+				action = policy(game, legal_actions)
+			column = action_columns[action]
+			player_column = game.current_player_index * action_count + column
+			action_counts[player_column] += 1
+			if first_round[player_column] == 0:
+				first_round[player_column] = game.round
+			round_action_counts[(game.round - 1) * action_count + column] += 1
+			game.apply_unchecked(action)
+		players = game.players
+		history["victory_points"][i] = [player.victory_points for player in players]
+		history["rank"][i] = game.get_player_ranks()
+		history["spice_harvested"][i] = [player.spice_harvested for player in players]
+		history["solari_earned"][i] = [player.solari_earned for player in players]
+		history["swordmaster"][i] = [player.swordmaster for player in players]
+		history["palace"][i] = [player.palace for player in players]
+		history["holtzman_shield"][i] = [player.holtzman_shield for player in players]
+		history["action_counts"][i] = np.reshape(action_counts, (Constant.PLAYER_COUNT, action_count))
+		history["first_round"][i] = np.reshape(first_round, (Constant.PLAYER_COUNT, action_count))
+		history["round_action_counts"][i] = np.reshape(round_action_counts, (Constant.MAX_ROUNDS, action_count))
+	return history
+
+def save_history(directory: str, history: dict[str, np.ndarray]) -> None:
+	with GameArchiveWriter(directory, columns=HISTORY_COLUMNS) as writer:
+		writer.add_games(history)
+
+def load_history(directory: str) -> dict[str, np.ndarray]:
+	return GameArchive(directory, HISTORY_COLUMNS).load()
+
+# Returns the sorted distinct labels and the index of the label of each element in them
+def _group(labels: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+	labels = np.asarray(labels).ravel()
+	if labels.dtype == np.bool_:
+		labels = labels.view(np.int8)
+	if np.issubdtype(labels.dtype, np.integer) and len(labels) > 0 and labels.min() >= 0 and labels.max() < _BINCOUNT_LIMIT:
+		present = np.bincount(labels) > 0
+		lookup = np.cumsum(present) - 1
+		return np.flatnonzero(present), lookup[labels]
+	return np.unique(labels, return_inverse=True)
+
+# Groups the labels, which are then broadcast to the shape (n_games, PLAYER_COUNT), so labels of the games can be passed as (n_games, 1)
+# Labels of games are grouped before they are broadcast, which only sorts one label per game if they have to be sorted
+def _group_players(games: dict[str, np.ndarray], labels: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+	labels = np.asarray(labels)
+	keys, groups = _group(labels)
+	return keys, np.broadcast_to(groups.reshape(labels.shape), games["rank"].shape).ravel()
+
+# Win rate of the players in each group, with labels of the shape (n_games, PLAYER_COUNT) or (n_games, 1)
+# Returns the distinct labels, the win rate of each of them and the number of players in each of them
+def win_rate_by_group(games: dict[str, np.ndarray], labels: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+	keys, groups = _group_players(games, labels)
+	counts = np.bincount(groups, minlength=len(keys))
+	wins = np.bincount(groups, weights=np.ravel(games["rank"]) == 0, minlength=len(keys))
+	return keys, wins / np.maximum(counts, 1), counts
+
+# Distribution of the final victory points of the players in each group, with labels like win_rate_by_group
+# Returns the distinct labels and an array of the shape (len(labels), maximum victory points + 1) with the fraction of players of each group with each score
+def victory_point_distribution(games: dict[str, np.ndarray], labels: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+	keys, groups = _group_players(games, labels)
+	victory_points = np.ravel(games["victory_points"]).astype(np.int64)
+	width = int(victory_points.max(initial=0)) + 1
+	histogram = np.bincount(groups * width + victory_points, minlength=len(keys) * width).reshape(len(keys), width)
+	return keys, histogram / np.maximum(histogram.sum(axis=1, keepdims=True), 1)
+
+# Returns an array of the shape (MAX_ROUNDS, len(ACTION_RANGE)) with the fraction of the actions performed in each round that were each action
+def action_frequency_by_round(games: dict[str, np.ndarray]) -> np.ndarray:
+	counts = games["round_action_counts"].sum(axis=0, dtype=np.int64)
+	return counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+
+# Pearson correlation between the number of times a player performed each action and their final victory points and whether they won
+# Returns an array of the shape (2, len(ACTION_RANGE)), actions that were performed equally often in all games have a correlation of 0
+def action_outcome_correlation(games: dict[str, np.ndarray]) -> np.ndarray:
+	action_counts = games["action_counts"].reshape(-1, len(ACTION_RANGE))
+	victory_points = np.ravel(games["victory_points"])
+	wins = np.ravel(games["rank"]) == 0
+	n = len(action_counts)
+	# Sums of the products of all pairs of the columns [action counts..., victory points, win, 1]
+	width = len(ACTION_RANGE) + 3
+	products = np.zeros((width, width))
+	chunk = np.empty((_CHUNK_SIZE, width), dtype=np.float32)
+	chunk[:, -1] = 1
+	for start in range(0, n, _CHUNK_SIZE):
+		rows = chunk[:min(_CHUNK_SIZE, n - start)]
+		end = start + len(rows)
+		rows[:, :-3] = action_counts[start:end]
+		rows[:, -3] = victory_points[start:end]
+		rows[:, -2] = wins[start:end]
+		products += rows.T @ rows
+	sums = products[-1]
+	covariance = products - np.outer(sums, sums) / max(n, 1)
+	variance = np.maximum(np.diag(covariance), 0)
+	actions = slice(0, len(ACTION_RANGE))
+	outcomes = slice(len(ACTION_RANGE), -1)
+	deviation = np.sqrt(np.outer(variance[outcomes], variance[actions]))
+	correlation = covariance[outcomes, actions]
+	return np.divide(correlation, deviation, out=np.zeros_like(correlation), where=deviation > 0)
+
+# Labels of the shape (n_games, PLAYER_COUNT) that are set for the players who first performed the action before the specified round
+def performed_before(games: dict[str, np.ndarray], action: Action | None, round: int) -> np.ndarray:
+	first_round = games["first_round"][..., ACTION_RANGE.index(action)]
+	return (first_round > 0) & (first_round < round)
+
+# Labels of the shape (n_games, 1) that identify the order of the conflicts of each game
+# The label is the number whose digits in base 11 are the conflict IDs, see decode_conflict_order
+def conflict_order_labels(games: dict[str, np.ndarray]) -> np.ndarray:
+	conflicts = games["conflicts"]
+	labels = np.zeros(len(conflicts), dtype=np.int64)
+	for i in range(Constant.MAX_ROUNDS):
+		labels *= Constant.MAX_ROUNDS + 1
+		labels += conflicts[:, i]
+	return labels[:, None]
+
+def decode_conflict_order(label: int) -> list[int]:
+	conflicts = []
+	for _ in range(Constant.MAX_ROUNDS):
+		label, conflict = divmod(int(label), Constant.MAX_ROUNDS + 1)
+		conflicts.append(conflict)
+	return conflicts[::-1]
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Records or loads game histories and prints a summary of their outcomes")
+	parser.add_argument("--games", type=int, default=1000, help="Number of games to record")
+	parser.add_argument("--policy", choices=list(POLICIES), default="random", help="Policy followed by all players")
+	parser.add_argument("--seed", type=int, default=None, help="Seed of the random number generator")
+	parser.add_argument("--load", default=None, help="Directory of a history archive to analyze instead of recording games")
+	parser.add_argument("--save", default=None, help="Directory of a history archive to append the recorded games to")
+	arguments = parser.parse_args()
+	if arguments.load is not None:
+		games = load_history(arguments.load)
+		if len(games["rank"]) == 0:
+			raise ThumperError(f"No games found in \"{arguments.load}\"")
+	else:
+		games = record_history(arguments.games, arguments.policy, arguments.seed)
+		if arguments.save is not None:
+			save_history(arguments.save, games)
+	start = time.perf_counter()
+	swordmaster_keys, swordmaster_win_rates, swordmaster_counts = win_rate_by_group(games, performed_before(games, Action.SWORDMASTER, 3))
+	conflict_keys, distributions = victory_point_distribution(games, conflict_order_labels(games))
+	frequencies = action_frequency_by_round(games)
+	correlations = action_outcome_correlation(games)
+	duration = time.perf_counter() - start
+	print(f"Analyzed {len(games['rank'])} games in {duration:.2f} s")
+	for key, win_rate, count in zip(swordmaster_keys, swordmaster_win_rates, swordmaster_counts):
+		description = "before" if key else "not before"
+		print(f"Win rate with the Swordmaster bought {description} round 3: {win_rate:.3f} ({count} players)")
+	mean_victory_points = distributions @ np.arange(distributions.shape[1])
+	best = np.argmax(mean_victory_points)
+	print(f"{len(conflict_keys)} conflict orders, the highest mean victory points ({mean_victory_points[best]:.2f}) were scored with {decode_conflict_order(conflict_keys[best])}")
+	for round in range(Constant.MAX_ROUNDS):
+		if frequencies[round].any():
+			action = ACTION_RANGE[np.argmax(frequencies[round])]
+			name = "Pass" if action is None else action.name
+			print(f"Most frequent action in round {round + 1}: {name} ({frequencies[round].max():.1%})")
+	best_action = ACTION_RANGE[np.argmax(correlations[1])]
+	print(f"Action most correlated with winning: {'Pass' if best_action is None else best_action.name} ({correlations[1].max():.3f})")
+
+if __name__ == "__main__":
+	main()
\ No newline at end of file
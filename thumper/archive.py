@@ -0,0 +1,147 @@
+import os
+from typing import Final, Iterator
+import numpy as np
+from .constants import Constant
+from .player import ThumperPlayer
+from .error import ThumperError
+from .stats import ACTION_RANGE
+
+# Columns stored in the archive, with the shape of the values of a single game and their type
+# All of them are indexed by player index, the actions are counted in the order of ACTION_RANGE
+ARCHIVE_COLUMNS: Final[dict[str, tuple[tuple[int, ...], type]]] = {
+	"victory_points": ((Constant.PLAYER_COUNT,), np.int16),
+	# 0 for the winner
+	"rank": ((Constant.PLAYER_COUNT,), np.int8),
+	"spice_harvested": ((Constant.PLAYER_COUNT,), np.int16),
+	"solari_earned": ((Constant.PLAYER_COUNT,), np.int16),
+	"swordmaster": ((Constant.PLAYER_COUNT,), np.bool_),
+	"palace": ((Constant.PLAYER_COUNT,), np.bool_),
+	"holtzman_shield": ((Constant.PLAYER_COUNT,), np.bool_),
+	"action_counts": ((Constant.PLAYER_COUNT, len(ACTION_RANGE)), np.int16)
+}
+
+_SHARD_PREFIX: Final[str] = "shard-"
+_TEMPORARY_SUFFIX: Final[str] = ".tmp"
+
+def _get_shard_names(directory: str) -> list[str]:
+	if not os.path.isdir(directory):
+		return []
+	names = [name for name in os.listdir(directory) if name.startswith(_SHARD_PREFIX) and not name.endswith(_TEMPORARY_SUFFIX)]
+	return sorted(names)
+
+# Appends the outcomes of finished games to an archive in the directory, which is created if it does not exist yet
+# The games are buffered in memory and written as a shard of shard_size games once the buffer is full, with one .npy file per column
+# Each shard is written to a temporary directory that is renamed when it is complete, so readers never see partially written shards
+# Existing shards are kept, new ones are numbered after them
+# Archives with other columns, such as the histories of thumper.analytics, can be written by specifying them in the format of ARCHIVE_COLUMNS
+class GameArchiveWriter:
+	directory: str
+	shard_size: int
+	columns: dict[str, tuple[tuple[int, ...], type]]
+	_buffers: dict[str, np.ndarray]
+	_count: int
+	_shard_index: int
+
+	def __init__(self, directory: str, shard_size: int = 1 << 16, columns: dict[str, tuple[tuple[int, ...], type]] = ARCHIVE_COLUMNS):
+		if shard_size < 1:
+			raise ThumperError("The size of a shard must be positive")
+		self.directory = directory
+		self.shard_size = shard_size
+		self.columns = columns
+		os.makedirs(directory, exist_ok=True)
+		self._buffers = {name: np.zeros((shard_size,) + shape, dtype=dtype) for name, (shape, dtype) in columns.items()}
+		self._count = 0
+		shard_names = _get_shard_names(directory)
+		self._shard_index = int(shard_names[-1][len(_SHARD_PREFIX):]) + 1 if shard_names else 0
+
+	def __enter__(self) -> "GameArchiveWriter":
+		return self
+
+	def __exit__(self, *_) -> None:
+		self.close()
+
+	# ranks and action_counts are indexed by player index, action_counts is an array of the shape (PLAYER_COUNT, len(ACTION_RANGE))
+	# Only the columns in ARCHIVE_COLUMNS are set, archives with other columns have to be written with add_games
+	def add_game(self, players: list[ThumperPlayer], ranks: list[int], action_counts: np.ndarray) -> None:
+		i = self._count
+		buffers = self._buffers
+		for player in players:
+			j = player.index
+			buffers["victory_points"][i, j] = player.victory_points
+			buffers["spice_harvested"][i, j] = player.spice_harvested
+			buffers["solari_earned"][i, j] = player.solari_earned
+			buffers["swordmaster"][i, j] = player.swordmaster
+			buffers["palace"][i, j] = player.palace
+			buffers["holtzman_shield"][i, j] = player.holtzman_shield
+		buffers["rank"][i] = ranks
+		buffers["action_counts"][i] = action_counts
+		self._count += 1
+		if self._count == self.shard_size:
+			self.flush()
+
+	# Adds a batch of games, columns maps the names of the columns of the archive to arrays with one row per game
+	def add_games(self, columns: dict[str, np.ndarray]) -> None:
+		if set(columns) != set(self.columns):
+			raise ThumperError(f"The columns of the games must be {', '.join(self.columns)}")
+		game_count = len(next(iter(columns.values())))
+		offset = 0
+		while offset < game_count:
+			count = min(game_count - offset, self.shard_size - self._count)
+			for name, buffer in self._buffers.items():
+				buffer[self._count:self._count + count] = columns[name][offset:offset + count]
+			self._count += count
+			offset += count
+			if self._count == self.shard_size:
+				self.flush()
+
+	# Writes the buffered games as a new shard
+	def flush(self) -> None:
+		if self._count == 0:
+			return
+		name = f"{_SHARD_PREFIX}{self._shard_index:06d}"
+		temporary_path = os.path.join(self.directory, name + _TEMPORARY_SUFFIX)
+		os.makedirs(temporary_path, exist_ok=True)
+		for column, buffer in self._buffers.items():
+			np.save(os.path.join(temporary_path, f"{column}.npy"), buffer[:self._count])
+		os.replace(temporary_path, os.path.join(self.directory, name))
+		self._shard_index += 1
+		self._count = 0
+
+	def close(self) -> None:
+		self.flush()
+
+# Reads the shards written by GameArchiveWriter, whose files are memory-mapped rather than loaded
+# Only the shards that were complete when the archive was opened are included
+class GameArchive:
+	directory: str
+	columns: dict[str, tuple[tuple[int, ...], type]]
+	_shard_paths: list[str]
+	_shards: list[dict[str, np.ndarray]]
+
+	def __init__(self, directory: str, columns: dict[str, tuple[tuple[int, ...], type]] = ARCHIVE_COLUMNS):
+		self.directory = directory
+		self.columns = columns
+		self._shard_paths = [os.path.join(directory, name) for name in _get_shard_names(directory)]
+		self._shards = [self._load_shard(path) for path in self._shard_paths]
+
+	def __len__(self) -> int:
+		return sum(len(next(iter(shard.values()))) for shard in self._shards)
+
+	# Memory-mapped columns of each shard
+	def iter_shards(self) -> Iterator[dict[str, np.ndarray]]:
+		return iter(self._shards)
+
+	# Returns the column of all games, which is copied into a single array
+	def get_column(self, name: str) -> np.ndarray:
+		if name not in self.columns:
+			raise ThumperError(f"Unknown column \"{name}\"")
+		if not self._shards:
+			shape, dtype = self.columns[name]
+			return np.zeros((0,) + shape, dtype=dtype)
+		return np.concatenate([shard[name] for shard in self._shards])
+
+	def load(self) -> dict[str, np.ndarray]:
+		return {name: self.get_column(name) for name in self.columns}
+
+	def _load_shard(self, path: str) -> dict[str, np.ndarray]:
+		return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in self.columns}
\ No newline at end of file
@@ -0,0 +1,346 @@
+import random
+from typing import Final
+import numpy as np
+from .constants import Constant, Action
+from .action import ACTION_DEFINITIONS
+from .conflict import CONFLICT_REWARDS, CONFLICT_LEVELS
+from .error import ThumperError
+
+def _get_column(values) -> np.ndarray:
+	return np.array(values, dtype=np.int16)
+
+def _get_columns(action_enums) -> np.ndarray:
+	return np.array([i for i, definition in enumerate(ACTION_DEFINITIONS) if definition.action_enum in action_enums], dtype=np.intp)
+
+def _get_gain(gains: dict[Action, int]) -> np.ndarray:
+	return _get_column([gains.get(definition.action_enum, 0) for definition in ACTION_DEFINITIONS])
+
+def _get_conflict_rewards() -> np.ndarray:
+	rewards = np.zeros((len(CONFLICT_REWARDS), 3, 4), dtype=np.int16)
+	for id, conflict_rewards in CONFLICT_REWARDS.items():
+		rewards[id - 1] = conflict_rewards
+	return rewards
+
+# Per-action lookup tables, indexed by the same action indexes as the environment
+_ACTION_TYPE: Final[np.ndarray] = _get_column([-1 if d.action_type is None else d.action_type.value - 1 for d in ACTION_DEFINITIONS])
+_ACTION_ENUM: Final[np.ndarray] = _get_column([-1 if d.action_enum is None else d.action_enum.value - 1 for d in ACTION_DEFINITIONS])
+_REQUIRED_SPICE: Final[np.ndarray] = _get_column([d.spice for d in ACTION_DEFINITIONS])
+_REQUIRED_SOLARI: Final[np.ndarray] = _get_column([d.solari for d in ACTION_DEFINITIONS])
+_REQUIRED_GARRISON: Final[np.ndarray] = _get_column([d.garrison for d in ACTION_DEFINITIONS])
+_PAID_SPICE: Final[np.ndarray] = _REQUIRED_SPICE
+_PAID_SOLARI: Final[np.ndarray] = np.where(_ACTION_ENUM == Action.SWORDMASTER.value - 1, 0, _REQUIRED_SOLARI).astype(np.int16)
+_TROOPS_PRODUCED: Final[np.ndarray] = _get_column([d.troops_produced or 0 for d in ACTION_DEFINITIONS])
+_TROOPS_DEPLOYED: Final[np.ndarray] = _get_column([d.argument if d.deployment_limit is not None else 0 for d in ACTION_DEFINITIONS])
+_DEPLOYMENT_COLUMNS: Final[np.ndarray] = np.array([i for i, d in enumerate(ACTION_DEFINITIONS) if d.deployment_limit is not None], dtype=np.intp)
+_STONE_BURNER_TARGET: Final[np.ndarray] = _get_column([d.argument - 1 if d.action_enum == Action.STONE_BURNER else -1 for d in ACTION_DEFINITIONS])
+_STONE_BURNER_COLUMNS: Final[np.ndarray] = _get_columns([Action.STONE_BURNER])
+_POLITICAL_MANEUVERING_TYPE: Final[np.ndarray] = _get_column([d.argument.value - 1 if d.action_enum == Action.POLITICAL_MANEUVERING else -1 for d in ACTION_DEFINITIONS])
+_SPICE_GAIN: Final[np.ndarray] = _get_gain({
+	Action.HARVESTER: 3,
+	Action.REFINERY: 2,
+	Action.LOOT_VILLAGES: 1
+})
+_SOLARI_GAIN: Final[np.ndarray] = _get_gain({
+	Action.REFINERY: 1,
+	Action.SECURE_CONTRACT: 3,
+	Action.LOOT_VILLAGES: 4,
+	Action.POLITICAL_MANEUVERING: 1
+}) + _get_column([Constant.SELL_MELANGE_SOLARI[d.argument] if d.action_enum == Action.SELL_MELANGE else 0 for d in ACTION_DEFINITIONS])
+_GARRISON_GAIN: Final[np.ndarray] = _get_gain({
+	Action.HOLTZMAN_SHIELD: 1,
+	Action.RECRUITMENT_CENTER: 1,
+	Action.SARDAUKAR: 4
+})
+_INFLUENCE_GAIN: Final[np.ndarray] = _get_gain({
+	Action.STONE_BURNER: -1,
+	Action.LOOT_VILLAGES: -1,
+	Action.SARDAUKAR: 1,
+	Action.AUDIENCE_WITH_EMPEROR: 2,
+	Action.MOBILIZATION: 1,
+	Action.SEEK_ALLIES: 1
+})
+_SPICE_SILO: Final[int] = Action.SPICE_SILO.value - 1
+_CONSTRUCT_PALACE: Final[int] = Action.CONSTRUCT_PALACE.value - 1
+_HOLTZMAN_SHIELD: Final[int] = Action.HOLTZMAN_SHIELD.value - 1
+_SWORDMASTER: Final[int] = Action.SWORDMASTER.value - 1
+_CONFLICT_REWARDS: Final[np.ndarray] = _get_conflict_rewards()
+_ACTION_TYPES: Final[tuple[int, ...]] = tuple(range(Constant.ACTION_TYPES))
+
+class BatchedThumperGame:
+	size: int
+	round: np.ndarray
+	first_player_index: np.ndarray
+	current_player_index: np.ndarray
+	spice_in_silo: np.ndarray
+	game_ended: np.ndarray
+	available_actions: np.ndarray
+	conflicts: np.ndarray
+	spice: np.ndarray
+	solari: np.ndarray
+	troops_garrison: np.ndarray
+	troops_deployed: np.ndarray
+	influence: np.ndarray
+	swordmaster: np.ndarray
+	palace: np.ndarray
+	holtzman_shield: np.ndarray
+	agents_left: np.ndarray
+	victory_points: np.ndarray
+	conflict_victory_points: np.ndarray
+	previous_victory_points: np.ndarray
+	turns: np.ndarray
+	spice_harvested: np.ndarray
+	solari_earned: np.ndarray
+	actions: np.ndarray
+	_randoms: list[random.Random]
+
+	def __init__(self, size: int, seeds: list[int] | None = None):
+		self.size = size
+		# Game state, one row per game
+		self.round = np.zeros(size, dtype=np.int16)
+		self.first_player_index = np.zeros(size, dtype=np.int16)
+		self.current_player_index = np.zeros(size, dtype=np.int16)
+		self.spice_in_silo = np.zeros(size, dtype=np.int16)
+		self.game_ended = np.zeros(size, dtype=np.bool_)
+		self.available_actions = np.zeros((size, len(Action)), dtype=np.bool_)
+		# Conflict IDs in the order in which they are resolved
+		self.conflicts = np.zeros((size, Constant.MAX_ROUNDS), dtype=np.int16)
+		# Player state, one row per game and one column per player
+		shape = (size, Constant.PLAYER_COUNT)
+		self.spice = np.zeros(shape, dtype=np.int16)
+		self.solari = np.zeros(shape, dtype=np.int16)
+		self.troops_garrison = np.zeros(shape, dtype=np.int16)
+		self.troops_deployed = np.zeros(shape, dtype=np.int16)
+		self.influence = np.zeros(shape, dtype=np.int16)
+		self.swordmaster = np.zeros(shape, dtype=np.bool_)
+		self.palace = np.zeros(shape, dtype=np.bool_)
+		self.holtzman_shield = np.zeros(shape, dtype=np.bool_)
+		self.agents_left = np.zeros(shape, dtype=np.int16)
+		self.victory_points = np.zeros(shape, dtype=np.int16)
+		self.conflict_victory_points = np.zeros(shape, dtype=np.int16)
+		self.previous_victory_points = np.zeros(shape, dtype=np.int16)
+		self.turns = np.zeros(shape, dtype=np.int16)
+		self.spice_harvested = np.zeros(shape, dtype=np.int16)
+		self.solari_earned = np.zeros(shape, dtype=np.int16)
+		# Number of actions of each action type available to the player
+		self.actions = np.zeros(shape + (Constant.ACTION_TYPES,), dtype=np.int16)
+		self._randoms = [random.Random() for _ in range(size)]
+		self.reset(seeds)
+
+	def reset(self, seeds: list[int] | None = None) -> None:
+		self.reset_games(np.arange(self.size), seeds)
+
+	# Resets the specified games, drawing from each game's random number generator in the same order as ThumperGame.reset
+	# A game reset with a seed therefore replays ThumperGame(seed) when given the same actions
+	def reset_games(self, game_indices: np.ndarray, seeds: list[int] | None = None) -> None:
+		if seeds is not None:
+			if len(seeds) != len(game_indices):
+				raise ThumperError("The number of seeds must match the number of games")
+			for game_index, seed in zip(game_indices, seeds):
+				self._randoms[game_index].seed(seed)
+		self.round[game_indices] = 1
+		self.first_player_index[game_indices] = 0
+		self.current_player_index[game_indices] = 0
+		self.spice_in_silo[game_indices] = 1
+		self.game_ended[game_indices] = False
+		self.available_actions[game_indices] = True
+		self.spice[game_indices] = 0
+		self.solari[game_indices] = 0
+		self.troops_garrison[game_indices] = Constant.INITIAL_TROOPS
+		self.troops_deployed[game_indices] = 0
+		self.influence[game_indices] = 0
+		self.swordmaster[game_indices] = False
+		self.palace[game_indices] = False
+		self.holtzman_shield[game_indices] = False
+		self.agents_left[game_indices] = Constant.INITIAL_AGENTS
+		self.victory_points[game_indices] = 0
+		self.conflict_victory_points[game_indices] = 0
+		self.previous_victory_points[game_indices] = 0
+		self.turns[game_indices] = 0
+		self.spice_harvested[game_indices] = 0
+		self.solari_earned[game_indices] = 0
+		for game_index in game_indices:
+			self._roll_actions(game_index)
+			conflicts = []
+			for level in CONFLICT_LEVELS:
+				level = level[:]
+				self._randoms[game_index].shuffle(level)
+				conflicts += level
+			self.conflicts[game_index] = conflicts
+
+	def legal_action_mask(self) -> np.ndarray:
+		games = np.arange(self.size)
+		current = self.current_player_index
+		spice = self.spice[games, current]
+		solari = self.solari[games, current]
+		troops_garrison = self.troops_garrison[games, current]
+		actions = self.actions[games, current]
+		mask = ~self.game_ended[:, None] & (self.agents_left[games, current] > 0)[:, None]
+		mask = mask & np.where(_ACTION_TYPE >= 0, actions[:, _ACTION_TYPE] > 0, True)
+		mask &= np.where(_ACTION_ENUM >= 0, self.available_actions[:, _ACTION_ENUM], True)
+		mask &= spice[:, None] >= _REQUIRED_SPICE
+		mask &= solari[:, None] >= _REQUIRED_SOLARI
+		mask &= troops_garrison[:, None] >= _REQUIRED_GARRISON
+		mask &= np.where(_ACTION_ENUM == _CONSTRUCT_PALACE, ~self.palace[games, current][:, None], True)
+		mask &= np.where(_ACTION_ENUM == _HOLTZMAN_SHIELD, ~self.holtzman_shield[games, current][:, None], True)
+		mask &= np.where(_ACTION_ENUM == _SWORDMASTER, ~self.swordmaster[games, current][:, None], True)
+		targets = _STONE_BURNER_TARGET[_STONE_BURNER_COLUMNS]
+		mask[:, _STONE_BURNER_COLUMNS] &= (targets != current[:, None]) & (self.troops_garrison[:, targets] > 0)
+		troops_available = troops_garrison[:, None] + _TROOPS_PRODUCED[_DEPLOYMENT_COLUMNS]
+		mask[:, _DEPLOYMENT_COLUMNS] &= troops_available >= _TROOPS_DEPLOYED[_DEPLOYMENT_COLUMNS]
+		return mask
+
+	# Performs one action in each game that has not ended yet, actions are indexes into ACTION_DEFINITIONS
+	def step(self, actions: np.ndarray) -> None:
+		actions = np.asarray(actions, dtype=np.intp)
+		if actions.shape != (self.size,):
+			raise ThumperError(f"Expected {self.size} actions")
+		games = np.flatnonzero(~self.game_ended)
+		if not self.legal_action_mask()[games, actions[games]].all():
+			raise ThumperError("Tried to perform an action that is not available")
+		self.step_unchecked(actions)
+
+	# Like step but without checking whether the actions are legal, which corrupts the state of the games if they are not
+	def step_unchecked(self, actions: np.ndarray) -> None:
+		actions = np.asarray(actions, dtype=np.intp)
+		games = np.flatnonzero(~self.game_ended)
+		actions = actions[games]
+		current = self.current_player_index[games]
+		self._perform_actions(games, current, actions)
+		self._next_turn(games, current)
+
+	# Returns the rank of each player as an array of the shape (len(games), PLAYER_COUNT), with the same tiebreakers as ThumperGame.get_player_ranks
+	def get_player_ranks(self, games: np.ndarray) -> np.ndarray:
+		keys = [
+			self.victory_points[games],
+			self.spice[games],
+			self.solari[games],
+			self.influence[games],
+			self.troops_garrison[games]
+		]
+		# better[:, i, j] is set if player j is ranked ahead of player i
+		better = np.zeros((len(games), Constant.PLAYER_COUNT, Constant.PLAYER_COUNT), dtype=np.bool_)
+		equal = np.ones_like(better)
+		for key in keys:
+			better |= equal & (key[:, None, :] > key[:, :, None])
+			equal &= key[:, None, :] == key[:, :, None]
+		better |= equal & np.tri(Constant.PLAYER_COUNT, k=-1, dtype=np.bool_)
+		return better.sum(axis=2)
+
+	def _perform_actions(self, games: np.ndarray, current: np.ndarray, actions: np.ndarray) -> None:
+		players = (games, current)
+		action_type = _ACTION_TYPE[actions]
+		typed = action_type >= 0
+		self.actions[games[typed], current[typed], action_type[typed]] -= 1
+		action_enum = _ACTION_ENUM[actions]
+		self.available_actions[games[typed], action_enum[typed]] = False
+		self.spice[players] -= _PAID_SPICE[actions]
+		self.solari[players] -= _PAID_SOLARI[actions]
+		spice = _SPICE_GAIN[actions] + np.where(action_enum == _SPICE_SILO, self.spice_in_silo[games], 0)
+		self.spice[players] += spice
+		self.spice_harvested[players] += spice
+		solari = _SOLARI_GAIN[actions]
+		self.solari[players] += solari
+		self.solari_earned[players] += solari
+		troops_deployed = _TROOPS_DEPLOYED[actions]
+		self.troops_garrison[players] += _GARRISON_GAIN[actions] + _TROOPS_PRODUCED[actions] - troops_deployed
+		self.troops_deployed[players] += troops_deployed
+		self.influence[players] += _INFLUENCE_GAIN[actions]
+		self.palace[players] |= action_enum == _CONSTRUCT_PALACE
+		self.holtzman_shield[players] |= action_enum == _HOLTZMAN_SHIELD
+		swordmaster = action_enum == _SWORDMASTER
+		self.swordmaster[players] |= swordmaster
+		self.agents_left[players] += swordmaster
+		for game_index, player_index in zip(games[swordmaster], current[swordmaster]):
+			action_type = self._randoms[game_index].choice(_ACTION_TYPES)
+			self.actions[game_index, player_index, action_type] += 1
+		maneuvering_type = _POLITICAL_MANEUVERING_TYPE[actions]
+		maneuvering = maneuvering_type >= 0
+		self.actions[games[maneuvering], current[maneuvering], maneuvering_type[maneuvering]] += 1
+		target = _STONE_BURNER_TARGET[actions]
+		stone_burner = target >= 0
+		targets = (games[stone_burner], target[stone_burner])
+		troops_to_kill = np.full(len(targets[0]), 4, dtype=np.int16)
+		troops_killed = np.minimum(self.troops_deployed[targets], troops_to_kill)
+		self.troops_deployed[targets] -= troops_killed
+		troops_to_kill -= troops_killed
+		troops_killed = np.minimum(self.troops_garrison[targets], troops_to_kill)
+		self.troops_garrison[targets] -= troops_killed
+
+	def _next_turn(self, games: np.ndarray, current: np.ndarray) -> None:
+		self.agents_left[games, current] -= 1
+		self.turns[games, current] += 1
+		order = (current[:, None] + np.arange(1, Constant.PLAYER_COUNT + 1)) % Constant.PLAYER_COUNT
+		has_agents = self.agents_left[games[:, None], order] > 0
+		next_player = has_agents.any(axis=1)
+		first_available = np.argmax(has_agents, axis=1)
+		self.current_player_index[games[next_player]] = order[next_player, first_available[next_player]]
+		# There are no players with any agents left in these games, resolve the conflict
+		round_ended = games[~next_player]
+		if len(round_ended) > 0:
+			self._resolve_conflict(round_ended)
+			final_round = self.round[round_ended] >= Constant.MAX_ROUNDS
+			self.game_ended[round_ended[final_round]] = True
+			next_round = round_ended[~final_round]
+			self.round[next_round] += 1
+			self.first_player_index[next_round] = (self.first_player_index[next_round] + 1) % Constant.PLAYER_COUNT
+			self.current_player_index[next_round] = self.first_player_index[next_round]
+			spice_silo_available = self.available_actions[next_round, _SPICE_SILO]
+			self.spice_in_silo[next_round] = np.where(spice_silo_available, np.minimum(self.spice_in_silo[next_round] + 1, Constant.MAX_SPICE_SILO), 1)
+			self.available_actions[next_round] = True
+			self.agents_left[next_round] = np.where(self.swordmaster[next_round], 3, 2)
+			self.troops_deployed[next_round] = 0
+			for game_index in next_round:
+				self._roll_actions(game_index)
+		self._update_victory_points(games)
+
+	def _roll_actions(self, game_index: int) -> None:
+		actions = self.actions[game_index]
+		actions[:] = 0
+		for player_index in range(Constant.PLAYER_COUNT):
+			action_type_count = Constant.ACTION_TYPES
+			if self.swordmaster[game_index, player_index]:
+				action_type_count += 1
+			for action_type in self._randoms[game_index].choices(_ACTION_TYPES, k=action_type_count):
+				actions[player_index, action_type] += 1
+
+	def _resolve_conflict(self, games: np.ndarray) -> None:
+		troops_deployed = self.troops_deployed[games]
+		participants = troops_deployed > 0
+		keys = troops_deployed + self.holtzman_shield[games]
+		same_key = participants[:, None, :] & (keys[:, None, :] == keys[:, :, None])
+		# Only count the first player of each group with the same key so that groups are only counted once
+		earlier = np.tri(Constant.PLAYER_COUNT, k=-1, dtype=np.bool_)
+		group_leader = participants & ~(same_key & earlier).any(axis=2)
+		greater_groups = (group_leader[:, None, :] & (keys[:, None, :] > keys[:, :, None])).sum(axis=2)
+		# Each group with a larger key consumes one reward, ties drop to the next reward level
+		reward_level = greater_groups + (same_key.sum(axis=2) > 1)
+		winners = participants & (reward_level < 3)
+		conflict_ids = self.conflicts[games, self.round[games] - 1]
+		rewards = _CONFLICT_REWARDS[conflict_ids[:, None] - 1, np.minimum(reward_level, 2)]
+		self.conflict_victory_points[games] += np.where(winners, rewards[..., 0], 0)
+		self.influence[games] += np.where(winners, rewards[..., 1], 0)
+		self.spice[games] = np.where(winners, rewards[..., 2], self.spice[games])
+		self.solari[games] = np.where(winners, rewards[..., 3], self.solari[games])
+
+	def _update_victory_points(self, games: np.ndarray) -> None:
+		influence = self.influence[games]
+		victory_points = self.conflict_victory_points[games] + (influence >= 2) + (influence >= 4) + self.palace[games]
+		self.victory_points[games] = victory_points
+		ended = self.game_ended[games]
+		if ended.any():
+			self._add_influence_victory_points(games[ended])
+
+	def _add_influence_victory_points(self, games: np.ndarray) -> None:
+		min_influence = 6
+		influence = self.influence[games]
+		players = np.argsort(-influence, axis=1, kind="stable")
+		rows = np.arange(len(games))
+		player1 = players[:, 0]
+		player2 = players[:, 1]
+		influence1 = influence[rows, player1]
+		influence2 = influence[rows, player2]
+		influence3 = influence[rows, players[:, 2]]
+		leader = influence1 > influence2
+		tied = ~leader & (influence1 >= min_influence) & (influence2 >= min_influence)
+		self.victory_points[games, player1] += np.where(leader & (influence1 >= min_influence), 2, 0) + tied
+		self.victory_points[games, player2] += (leader & (influence2 >= min_influence) & (influence2 > influence3)) | tied
\ No newline at end of file
@@ -0,0 +1,60 @@
+import argparse
+import random
+import subprocess
+import sys
+import time
+from typing import Final
+from .action import get_action_indices
+from .env import env
+
+# Steps an environment with random legal actions the way a training loop does, returns the average time per step in seconds
+def benchmark_env(environment, steps: int, seed: int = 0) -> float:
+	game = environment.unwrapped.game
+	action_random = random.Random(seed)
+	environment.reset(seed=seed)
+	start = time.perf_counter()
+	for _ in range(steps):
+		if game.game_ended:
+			environment.reset()
+		observation, reward, termination, truncation, info = environment.last()
+		legal_actions = get_action_indices(game.legal_action_bits())
+		environment.step(action_random.choice(legal_actions))
+	return (time.perf_counter() - start) / steps
+
+# Third-party packages that importing the engine is not supposed to load
+HEAVY_MODULES: Final[list[str]] = ["gymnasium", "pettingzoo", "stable_baselines3", "matplotlib", "PyQt6"]
+
+_IMPORT_SCRIPT: Final[str] = """import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+print(",".join(name for name in {heavy_modules!r} if name in sys.modules))"""
+
+# Imports the module in new interpreters, returns the shortest import time in seconds and the heavy modules it loaded
+def benchmark_import(module: str, runs: int = 5) -> tuple[float, list[str]]:
+	script = _IMPORT_SCRIPT.format(module=module, heavy_modules=HEAVY_MODULES)
+	durations = []
+	for _ in range(runs):
+		output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout.splitlines()
+		durations.append(float(output[0]))
+		loaded = [name for name in output[1].split(",") if name]
+	return min(durations), loaded
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Measures the import time of the engine and the environment as well as the time per step of the environment with and without checks")
+	parser.add_argument("--steps", type=int, default=100000, help="Number of steps per environment")
+	parser.add_argument("--seed", type=int, default=0, help="Seed of the random number generators")
+	parser.add_argument("--import-runs", type=int, default=5, help="Number of interpreters started to measure the import time of each module")
+	arguments = parser.parse_args()
+	for module in ["thumper.game", "thumper.env"]:
+		duration, loaded = benchmark_import(module, arguments.import_runs)
+		dependencies = ", ".join(loaded) if loaded else "none"
+		print(f"import {module}: {duration * 1e3:.1f} ms (heavy dependencies loaded: {dependencies})")
+	checked = benchmark_env(env(), arguments.steps, arguments.seed)
+	fast = benchmark_env(env(fast=True), arguments.steps, arguments.seed)
+	print(f"env(): {checked * 1e6:.1f} µs/step")
+	print(f"env(fast=True): {fast * 1e6:.1f} µs/step")
+	print(f"Saved {(checked - fast) * 1e6:.1f} µs/step ({checked / fast:.2f}x)")
+
+if __name__ == "__main__":
+	main()
\ No newline at end of file
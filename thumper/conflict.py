@@ -1,11 +1,60 @@
+from typing import Final
+
 class Conflict:
+	__slots__ = ("id", "rewards")
+
 	def __init__(self, id, rewards):
 		self.id = id
 		self.rewards = rewards
 
 class ConflictReward:
+	__slots__ = ("victory_points", "influence", "spice", "solari")
+
 	def __init__(self, victory_points, influence, spice, solari):
 		self.victory_points = victory_points
 		self.influence = influence
 		self.spice = spice
-		self.solari = solari
\ No newline at end of file
+		self.solari = solari
+
+# Rewards for the first, second and third place of each conflict, as (victory points, influence, spice, solari)
+CONFLICT_REWARDS: Final[dict[int, list[tuple[int, int, int, int]]]] = {
+	1: [(0, 1, 0, 2), (0, 0, 0, 3), (0, 0, 0, 2)],
+	2: [(1, 0, 0, 0), (0, 0, 1, 2), (0, 0, 1, 0)],
+	3: [(0, 0, 0, 6), (0, 0, 0, 4), (0, 0, 0, 2)],
+	4: [(1, 0, 0, 0), (0, 0, 2, 0), (0, 0, 0, 1)],
+	5: [(0, 2, 0, 0), (0, 0, 2, 0), (0, 0, 1, 0)],
+	6: [(1, 0, 0, 0), (0, 0, 2, 0), (0, 0, 1, 0)],
+	7: [(1, 0, 3, 0), (0, 0, 5, 0), (0, 0, 3, 0)],
+	8: [(2, 0, 0, 0), (0, 0, 5, 0), (0, 0, 3, 0)],
+	9: [(0, 2, 3, 0), (0, 1, 5, 0), (0, 0, 3, 0)],
+	10: [(2, 0, 0, 0), (1, 0, 0, 0), (0, 0, 3, 0)]
+}
+
+# Conflict IDs are shuffled within each level, the levels themselves are played in order
+CONFLICT_LEVELS: Final[list[list[int]]] = [
+	[1],
+	[2, 3, 4, 5, 6],
+	[7, 8, 9, 10]
+]
+
+def _get_conflicts() -> dict[int, Conflict]:
+	conflicts = {}
+	for id, rewards in CONFLICT_REWARDS.items():
+		conflicts[id] = Conflict(id, tuple(ConflictReward(*reward) for reward in rewards))
+	return conflicts
+
+# Conflicts are never modified so all games share the same instances
+CONFLICTS: Final[dict[int, Conflict]] = _get_conflicts()
+
+def _get_conflict_level_ranges() -> list[tuple[int, int]]:
+	ranges = []
+	offset = 0
+	for level in CONFLICT_LEVELS:
+		ranges.append((offset, offset + len(level)))
+		offset += len(level)
+	return ranges
+
+# The conflicts of all levels in order, games copy this deck and shuffle the ranges of the levels in place
+CONFLICT_DECK: Final[tuple[Conflict, ...]] = tuple(CONFLICTS[id] for level in CONFLICT_LEVELS for id in level)
+# Start and end indices of each level in CONFLICT_DECK
+CONFLICT_LEVEL_RANGES: Final[list[tuple[int, int]]] = _get_conflict_level_ranges()
\ No newline at end of file
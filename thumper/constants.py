@@ -20,6 +20,9 @@ class Constant:
 	MOBILIZATION_TROOPS_PRODUCED = 0
 	MOBILIZATION_DEPLOYMENT_LIMIT = 5
 
+	# Solari earned by selling the specified amount of spice
+	SELL_MELANGE_SOLARI = {1: 3, 2: 6, 3: 8}
+
 class ActionType(Enum):
 	ECONOMIC = 1
 	MILITARY = 2
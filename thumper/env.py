@@ -1,5 +1,7 @@
 import functools
 import random
+from collections.abc import Iterator, MutableMapping
+from typing import Any, Final
 import pettingzoo.utils.env
 from gymnasium.spaces import Discrete, MultiDiscrete, Box, Space, Dict
 from gymnasium.utils import EzPickle
@@ -7,21 +9,71 @@ from pettingzoo.utils.env import AgentID, ObsType
 from pettingzoo import AECEnv
 from pettingzoo.utils import wrappers
 import numpy as np
-from .game import ThumperGame
-from .constants import Constant, Action, ActionType, Cost
-from .action import EnvironmentAction
+from .game import ThumperGame, perform_action
+from .constants import Constant, Action, ActionType
+from .action import ActionDefinition, ACTION_DEFINITIONS, ACTION_COUNT, get_action_mask_array
 from .player import ThumperPlayer
+from .error import ThumperError
+from .observation import OBSERVATION_SIZE, get_observation_nvec, write_observations, write_player_observation
 
 def wrap_env(env):
 	env = wrappers.AssertOutOfBoundsWrapper(env)
 	env = wrappers.OrderEnforcingWrapper(env)
 	return env
 
-def env(**kwargs):
-	env = raw_env(**kwargs)
-	env = wrap_env(env)
+# With fast=True the environment is returned without the wrappers and performs actions without checking them, see fast_env
+def env(fast: bool = False, **kwargs):
+	env = raw_env(fast=fast, **kwargs)
+	if not fast:
+		env = wrap_env(env)
 	return env
 
+# Environment for training with a masked policy, which can only ever choose legal actions
+# It skips the PettingZoo wrappers as well as the assertions and legality checks of the actions, so an illegal action corrupts the game
+# Use env() to debug policies or code that steps the environment
+def fast_env(**kwargs):
+	return env(fast=True, **kwargs)
+
+# Formats of the observations returned by raw_env.observe:
+# "dict": the int8 observation together with the action mask, as {"observation": ..., "action_mask": ...}
+# "int8": the flat int8 observation, the action mask is only available through action_masks()
+# "float32": like "int8" but each entry is divided by its maximum, so all of them are between 0 and 1
+OBSERVATION_FORMATS: Final[list[str]] = ["dict", "int8", "float32"]
+
+# MultiDiscrete space of the int8 observations, which keeps its nvec as int64 so that SB3 can add them up
+# SB3 determines the size of the one-hot encoding with the built-in sum, which overflows with int8 scalars
+class Int8MultiDiscrete(MultiDiscrete):
+	def __init__(self, nvec: list[int], seed: int | None = None):
+		super().__init__(nvec, dtype=np.int8, seed=seed)
+		self.nvec = self.nvec.astype(np.int64)
+
+# Dict view of an array indexed by player index, keyed by the names of the agents, which is how PettingZoo accesses rewards and terminations
+class SeatView(MutableMapping):
+	_values: np.ndarray
+	_agent_indices: dict[AgentID, int]
+
+	def __init__(self, values: np.ndarray, agent_indices: dict[AgentID, int]):
+		self._values = values
+		self._agent_indices = agent_indices
+
+	def __getitem__(self, agent: AgentID) -> Any:
+		return self._values[self._agent_indices[agent]].item()
+
+	def __setitem__(self, agent: AgentID, value: Any) -> None:
+		self._values[self._agent_indices[agent]] = value
+
+	def __delitem__(self, agent: AgentID) -> None:
+		raise ThumperError("Agents cannot be removed from the environment")
+
+	def __iter__(self) -> Iterator[AgentID]:
+		return iter(self._agent_indices)
+
+	def __len__(self) -> int:
+		return len(self._agent_indices)
+
+	def __repr__(self) -> str:
+		return repr(dict(self))
+
 class raw_env(AECEnv, EzPickle):
 	metadata = {
 		"render_modes": [],
@@ -31,63 +83,59 @@ class raw_env(AECEnv, EzPickle):
 	}
 
 	RANK_REWARDS = [4, 2, 1, 0]
+	# The action space consists of indexes into this list, which is shared by all environments and the engine
+	actions: list[ActionDefinition] = ACTION_DEFINITIONS
 
 	game: ThumperGame
 	last_game_players: list[ThumperPlayer] | None
 	last_action: ActionType | None
+	last_player_index: int | None
 	_end_of_game_rewards: bool
-
-	def __init__(self, end_of_game_rewards: bool = False, render_mode: str | None = None, screen_height: int | None = 800):
-		EzPickle.__init__(self, render_mode, screen_height)
+	_fast: bool
+	_observation_format: str
+	_observation_scale: np.ndarray
+	_agent_indices: dict[AgentID, int]
+	_observations: np.ndarray
+	_action_mask: np.ndarray | None
+	_seat_rewards: np.ndarray
+	_seat_cumulative_rewards: np.ndarray
+	_seat_terminations: np.ndarray
+	_rank_rewards: np.ndarray
+
+	def __init__(self, end_of_game_rewards: bool = False, render_mode: str | None = None, screen_height: int | None = 800, fast: bool = False, observation_format: str = "dict"):
+		EzPickle.__init__(self, end_of_game_rewards, render_mode, screen_height, fast, observation_format)
 		super().__init__()
+		if observation_format not in OBSERVATION_FORMATS:
+			raise ThumperError(f"Unknown observation format \"{observation_format}\"")
 		self.game = ThumperGame()
+		self.random = random.Random()
 		self.last_game_players = None
 		self.last_action = None
+		self.last_player_index = None
 		self._end_of_game_rewards = end_of_game_rewards
+		self._fast = fast
+		self._observation_format = observation_format
 		self.agents: list[AgentID] = [f"player_{str(i)}" for i in range(Constant.PLAYER_COUNT)]
 		self.possible_agents = self.agents[:]
+		self._agent_indices = {name: i for i, name in enumerate(self.agents)}
+		# The observation of each agent, indexed by player index, which are kept up to date as actions are performed
+		self._observations = np.zeros((Constant.PLAYER_COUNT, OBSERVATION_SIZE), dtype=np.int8)
+		write_observations(self.game, self._observations)
+		# Legal action mask of the current state as returned by observe, computed when it is first needed
+		self._action_mask = None
+		# Rewards, cumulative rewards and terminations indexed by player index, PettingZoo accesses them through the SeatView dicts
+		self._seat_rewards = np.zeros(Constant.PLAYER_COUNT, dtype=np.int32)
+		self._seat_cumulative_rewards = np.zeros(Constant.PLAYER_COUNT, dtype=np.int32)
+		self._seat_terminations = np.zeros(Constant.PLAYER_COUNT, dtype=np.bool_)
+		self._rank_rewards = np.array(self.RANK_REWARDS, dtype=np.int32)
+		self.rewards = SeatView(self._seat_rewards, self._agent_indices)
+		self._cumulative_rewards = SeatView(self._seat_cumulative_rewards, self._agent_indices)
+		self.terminations = SeatView(self._seat_terminations, self._agent_indices)
 		self._reset_common()
-		# Current round (1 to 9), one-hot encoded, so 0 to 1 each
-		one_hot_encoding = Constant.MAX_ROUNDS * [2]
-		nvec = one_hot_encoding
-		# Conflict reward
-		nvec += one_hot_encoding
-		for i in range(Constant.PLAYER_COUNT):
-			nvec += [
-				# Action type counts (0 - 4)
-				5,
-				5,
-				5,
-				# Solari (0 - 10+)
-				11,
-				# Spice (0 - 10+)
-				11,
-				# Troops in garrison (0 - 10+)
-				11,
-				# Troops deployed (0 - 10+)
-				11,
-				# Influence (-5 or less to 10+)
-				16,
-				# Swordmaster (0 to 1)
-				2,
-				# Palace (0 to 1)
-				2,
-				# Holtzman Shield (0 to 1)
-				2,
-				# Agents left (0 to 3)
-				4,
-				# Victory points (0 to 12)
-				13
-			]
-		self._initialize_actions()
-		total_actions = len(self.actions)
-		self.observation_spaces: dict[AgentID, Dict] = {
-			name: Dict({
-				"observation": MultiDiscrete(nvec, dtype=np.int8),
-				"action_mask": Box(low=0, high=1, shape=(total_actions,), dtype=np.int8)
-			})
-			for name in self.agents
-		}
+		nvec = get_observation_nvec()
+		self.action_spaces = {name: Discrete(ACTION_COUNT) for name in self.agents}
+		self._observation_scale = 1 / (np.array(nvec, dtype=np.float32) - 1)
+		self.observation_spaces: dict[AgentID, Space] = {name: self._get_observation_space(nvec) for name in self.agents}
 
 	@functools.lru_cache(maxsize=None)
 	def observation_space(self, agent: AgentID) -> Space:
@@ -98,49 +146,61 @@ class raw_env(AECEnv, EzPickle):
 		return self.action_spaces[agent]
 
 	def observe(self, agent: AgentID) -> ObsType | None:
-		observation = self._get_observation(agent)
-		action_mask = [1 if action.enabled(self.game) else 0 for action in self.actions]
+		observation = self._format_observations(self._observations[self._agent_indices[agent]])
+		if self._observation_format != "dict":
+			return observation
+		action_mask = self._get_action_mask()
 		output = {
 			"observation": observation,
 			"action_mask": action_mask
 		}
 		return output
 
+	# Returns the observations and action masks of all agents, in the order of self.agents, as returned by observe
+	# The observations are an array of the shape (PLAYER_COUNT, OBSERVATION_SIZE), which is float32 for the "float32" format and int8 otherwise
+	# The masks are an int8 array of the shape (PLAYER_COUNT, ACTION_COUNT)
+	def observe_all(self) -> tuple[np.ndarray, np.ndarray]:
+		action_masks = np.tile(self._get_action_mask(), (Constant.PLAYER_COUNT, 1))
+		return self._format_observations(self._observations), action_masks
+
 	def reset(self, seed: int | None = None, options: dict | None = None) -> None:
+		if seed is not None:
+			self.random.seed(seed)
 		self._reset_common()
 		self.last_game_players = self.game.get_ranked_players()
-		self.game.reset()
+		self.game.reset(seed)
+		write_observations(self.game, self._observations)
+		self._action_mask = None
 
 	def step(self, action: pettingzoo.utils.env.ActionType) -> None:
-		assert not self.game.game_ended
-		assert 0 <= action < len(self.actions)
-		environment_action = self.actions[action]
-		environment_action.perform(self.game)
-		self.agent_selection = self.agents[self.game.current_player_index]
-		self.last_action = environment_action.action_enum
-		self.rewards = {}
-		if self.game.game_ended:
-			ranked_players = self.game.get_ranked_players()
+		player_index = self.game.current_player_index
+		round = self.game.round
+		if self._fast:
+			definition = ACTION_DEFINITIONS[action]
+			self.game.apply_unchecked(action)
 		else:
-			ranked_players = None
-		for i in range(Constant.PLAYER_COUNT):
-			player = self.game.players[i]
-			if self._end_of_game_rewards:
-				if self.game.game_ended:
-					rank = ranked_players.index(player)
-					reward = self.RANK_REWARDS[rank]
-				else:
-					reward = 0
+			assert not self.game.game_ended
+			assert 0 <= action < ACTION_COUNT
+			assert self.game.legal_action_bits() >> action & 1
+			definition = ACTION_DEFINITIONS[action]
+			perform_action(self.game, action)
+		self._update_observations(definition, player_index, round)
+		self._action_mask = None
+		self.agent_selection = self.agents[self.game.current_player_index]
+		self.last_action = definition.action_enum
+		self.last_player_index = player_index
+		if self._end_of_game_rewards:
+			if self.game.game_ended:
+				self._seat_rewards[:] = self._rank_rewards[self.game.get_player_ranks()]
 			else:
-				reward = player.get_reward()
-			name = self.agents[i]
-			self.rewards[name] = reward
-			self._cumulative_rewards[name] += reward
-		self.terminations = {name: self.game.game_ended for name in self.agents}
+				self._seat_rewards[:] = 0
+		else:
+			self._seat_rewards[:] = [player.get_reward() for player in self.game.players]
+		self._seat_cumulative_rewards += self._seat_rewards
+		self._seat_terminations[:] = self.game.game_ended
 
-	def action_masks(self) -> list[bool]:
-		masks = [action.enabled(self.game) for action in self.actions]
-		return masks
+	def action_masks(self) -> np.ndarray:
+		return self._get_action_mask().view(np.bool_)
 
 	def get_last_game_players(self) -> list[ThumperPlayer] | None:
 		if self.last_game_players is not None:
@@ -151,246 +211,41 @@ class raw_env(AECEnv, EzPickle):
 			return None
 
 	def _reset_common(self) -> None:
-		self.agent_selection = random.choice(self.agents)
-		self.rewards = {name: 0 for name in self.agents}
-		self._cumulative_rewards = {name: 0 for name in self.agents}
-		self.terminations = {name: False for name in self.agents}
+		self.agent_selection = self.random.choice(self.agents)
+		self._seat_rewards[:] = 0
+		self._seat_cumulative_rewards[:] = 0
+		self._seat_terminations[:] = False
 		self.truncations = {name: False for name in self.agents}
 		self.infos = {name: {} for name in self.agents}
 
-	def _initialize_actions(self) -> None:
-		actions = [
-			EnvironmentAction(
-				self.game.construct_palace,
-				ActionType.ECONOMIC,
-				Action.CONSTRUCT_PALACE,
-				solari=Cost.CONSTRUCT_PALACE,
-				enabled=self.game.construct_palace_enabled
-			),
-			EnvironmentAction(
-				self.game.harvester,
-				ActionType.ECONOMIC,
-				Action.HARVESTER
-			),
-			EnvironmentAction(
-				self.game.refinery,
-				ActionType.ECONOMIC,
-				Action.REFINERY
-			),
-			EnvironmentAction(
-				self.game.spice_silo,
-				ActionType.ECONOMIC,
-				Action.SPICE_SILO
-			),
-			EnvironmentAction(
-				self.game.sell_melange,
-				ActionType.ECONOMIC,
-				Action.SELL_MELANGE,
-				spice=1,
-				argument=1
-			),
-			EnvironmentAction(
-				self.game.sell_melange,
-				ActionType.ECONOMIC,
-				Action.SELL_MELANGE,
-				spice=2,
-				argument=2
-			),
-			EnvironmentAction(
-				self.game.sell_melange,
-				ActionType.ECONOMIC,
-				Action.SELL_MELANGE,
-				spice=3,
-				argument=3
-			),
-			EnvironmentAction(
-				self.game.secure_contract,
-				ActionType.ECONOMIC,
-				Action.SECURE_CONTRACT
-			),
-			EnvironmentAction(
-				self.game.holtzman_shield,
-				ActionType.MILITARY,
-				Action.HOLTZMAN_SHIELD,
-				spice=Cost.HOLTZMAN_SHIELD,
-				enabled=self.game.holtzman_shield_enabled
-			),
-			EnvironmentAction(
-				self.game.stone_burner,
-				ActionType.MILITARY,
-				Action.STONE_BURNER,
-				spice=Cost.STONE_BURNER,
-				enabled=self.game.stone_burner_enabled,
-				enabled_argument=True,
-				expand=(1, Constant.PLAYER_COUNT)
-			),
-			EnvironmentAction(
-				self.game.hire_mercenaries,
-				ActionType.MILITARY,
-				Action.HIRE_MERCENARIES,
-				solari=Cost.HIRE_MERCENARIES,
-				troops_produced=Constant.HIRE_MERCENARIES_TROOPS_PRODUCED,
-				deployment_limit=Constant.HIRE_MERCENARIES_DEPLOYMENT_LIMIT,
-				expand=(0, 3)
-			),
-			EnvironmentAction(
-				self.game.quick_strike,
-				ActionType.MILITARY,
-				Action.QUICK_STRIKE,
-				troops_produced=Constant.QUICK_STRIKE_TROOPS_PRODUCED,
-				deployment_limit=Constant.QUICK_STRIKE_DEPLOYMENT_LIMIT,
-				expand=(0, 2)
-			),
-			EnvironmentAction(
-				self.game.recruitment_center,
-				ActionType.MILITARY,
-				Action.RECRUITMENT_CENTER
-			),
-			EnvironmentAction(
-				self.game.troop_transports,
-				ActionType.MILITARY,
-				Action.TROOP_TRANSPORTS,
-				enabled=self.game.has_garrison,
-				troops_produced=Constant.TROOP_TRANSPORTS_TROOPS_PRODUCED,
-				deployment_limit=Constant.TROOP_TRANSPORTS_DEPLOYMENT_LIMIT,
-				expand=(0, 4)
-			),
-			EnvironmentAction(
-				self.game.loot_villages,
-				ActionType.MILITARY,
-				Action.LOOT_VILLAGES
-			),
-			EnvironmentAction(
-				self.game.swordmaster,
-				ActionType.POLITICAL,
-				Action.SWORDMASTER,
-				solari=Cost.SWORDMASTER,
-				enabled=self.game.swordmaster_enabled
-			),
-			EnvironmentAction(
-				self.game.sardaukar,
-				ActionType.POLITICAL,
-				Action.SARDAUKAR,
-				spice=Cost.SARDAUKAR
-			),
-			EnvironmentAction(
-				self.game.audience_with_emperor,
-				ActionType.POLITICAL,
-				Action.AUDIENCE_WITH_EMPEROR,
-				spice=Cost.AUDIENCE_WITH_EMPEROR
-			),
-			EnvironmentAction(
-				self.game.mobilization,
-				ActionType.POLITICAL,
-				Action.MOBILIZATION,
-				solari=Cost.MOBILIZATION,
-				enabled=self.game.has_garrison,
-				troops_produced=Constant.MOBILIZATION_TROOPS_PRODUCED,
-				deployment_limit=Constant.MOBILIZATION_DEPLOYMENT_LIMIT,
-				expand=(0, 5)
-			),
-			EnvironmentAction(
-				self.game.seek_allies,
-				ActionType.POLITICAL,
-				Action.SEEK_ALLIES,
-				solari=Cost.SEEK_ALLIES
-			),
-			EnvironmentAction(
-				self.game.political_maneuvering,
-				ActionType.POLITICAL,
-				Action.POLITICAL_MANEUVERING,
-				argument=ActionType.ECONOMIC
-			),
-			EnvironmentAction(
-				self.game.political_maneuvering,
-				ActionType.POLITICAL,
-				Action.POLITICAL_MANEUVERING,
-				argument=ActionType.MILITARY
-			),
-			EnvironmentAction(
-				self.game.political_maneuvering,
-				ActionType.POLITICAL,
-				Action.POLITICAL_MANEUVERING,
-				argument=ActionType.POLITICAL
-			),
-			EnvironmentAction(
-				self.game.pass_turn,
-				None,
-				None
-			)
-		]
-		self.actions = []
-		for action in actions:
-			if action.expand is not None:
-				minimum, maximum = action.expand
-				for i in range(minimum, maximum + 1):
-					expanded_action = action.argument_copy(i)
-					self.actions.append(expanded_action)
-			else:
-				self.actions.append(action)
-		# The action space consists of indexes into self.actions
-		total_actions = len(self.actions)
-		self.action_spaces = {name: Discrete(total_actions) for name in self.agents}
-
-	def _get_observation(self, agent: AgentID) -> np.array:
-		# One-hot encoding of the current round
-		observation = self._get_one_hot_encoding(self.game.round)
-		# One-hot encoding of the randomized conflict rewards
-		conflict = self.game.conflicts[self.game.round - 1]
-		observation += self._get_one_hot_encoding(conflict.id)
-		# Resources, etc., of each player, commencing with the agent's
-		agent_index = self.agents.index(agent)
+	def _get_observation_space(self, nvec: list[int]) -> Space:
+		if self._observation_format == "float32":
+			return Box(low=0, high=1, shape=(OBSERVATION_SIZE,), dtype=np.float32)
+		elif self._observation_format == "int8":
+			return Int8MultiDiscrete(nvec)
+		return Dict({
+			"observation": MultiDiscrete(nvec, dtype=np.int8),
+			"action_mask": Box(low=0, high=1, shape=(ACTION_COUNT,), dtype=np.int8)
+		})
+
+	# Returns a new array so that observations returned earlier are not modified, converting it to float32 in the same step if necessary
+	def _format_observations(self, observations: np.ndarray) -> np.ndarray:
+		if self._observation_format == "float32":
+			return observations * self._observation_scale
+		return observations.copy()
+
+	# A new array is created for each state so that masks returned earlier are not modified
+	def _get_action_mask(self) -> np.ndarray:
+		if self._action_mask is None:
+			self._action_mask = get_action_mask_array(self.game.legal_action_bits())
+		return self._action_mask
+
+	# Only the parts of the observations changed by the action are updated, unless it ended the round
+	def _update_observations(self, definition: ActionDefinition, player_index: int, round: int) -> None:
+		if self.game.round != round or self.game.game_ended:
+			write_observations(self.game, self._observations)
+			return
 		players = self.game.players
-		observation += self._get_player_observation(players[agent_index])
-		for i in range(len(players)):
-			if i != agent_index:
-				player = players[i]
-				observation += self._get_player_observation(player)
-		return np.array(observation, dtype=np.int8)
-
-	def _get_one_hot_encoding(self, value: int) -> list[int]:
-		observation = []
-		for i in range(Constant.MAX_ROUNDS):
-			binary_value = 1 if value == i + 1 else 0
-			observation.append(binary_value)
-		return observation
-
-	def _get_player_observation(self, player: ThumperPlayer):
-		def adjust(x: int) -> int:
-			return min(x, 10)
-
-		def adjust_influence(x: int) -> int:
-			return max(min(x + 5, 15), 0)
-
-		swordmaster = self._from_bool(player.swordmaster)
-		palace = self._from_bool(player.palace)
-		holtzman_shield = self._from_bool(player.holtzman_shield)
-		observation = self._from_action_types(player)
-		observation += [
-			adjust(player.spice),
-			adjust(player.solari),
-			adjust(player.troops_garrison),
-			adjust(player.troops_deployed),
-			adjust_influence(player.influence),
-			swordmaster,
-			palace,
-			holtzman_shield,
-			player.agents_left,
-			player.victory_points
-		]
-		return observation
-
-	def _from_bool(self, value: bool) -> int:
-		return 1 if value else 0
-
-	def _from_action_types(self, player: ThumperPlayer) -> list[int]:
-		actions = [
-			ActionType.ECONOMIC,
-			ActionType.MILITARY,
-			ActionType.POLITICAL
-		]
-		observations = len(actions) * [0]
-		for action in player.actions:
-			index = actions.index(action)
-			observations[index] += 1
-		return observations
\ No newline at end of file
+		write_player_observation(players[player_index], self._observations)
+		if definition.action_enum == Action.STONE_BURNER:
+			write_player_observation(players[definition.argument - 1], self._observations)
\ No newline at end of file
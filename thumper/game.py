@@ -1,12 +1,32 @@
 import random
-from functools import cmp_to_key
+import struct
+from typing import Callable, Final
+import numpy as np
 from .constants import Constant, Action, ActionType, Cost
 from .player import ThumperPlayer
 from .error import ThumperError
-from .conflict import Conflict, ConflictReward
+from .action import ActionDefinition, ACTION_DEFINITIONS, ACTION_COUNT, ACTION_BITS, ALL_AVAILABLE_ACTIONS, ACTION_ENUM_MASKS, ACTION_TYPE_MASKS, SPICE_MASKS, SOLARI_MASKS, GARRISON_MASKS, STONE_BURNER_MASKS, get_available_action_mask, get_action_indices
+from .zobrist import ROUND_KEYS, FIRST_PLAYER_KEYS, CURRENT_PLAYER_KEYS, SPICE_IN_SILO_KEYS, GAME_ENDED_KEY, ACTION_KEYS, CONFLICT_KEYS
+from .conflict import CONFLICTS, CONFLICT_DECK, CONFLICT_LEVEL_RANGES
+
+class UndoRecord:
+	def __init__(self, round, first_player_index, current_player_index, spice_in_silo, game_ended, available_actions, zobrist_hash, player_states, random_state):
+		self.round = round
+		self.first_player_index = first_player_index
+		self.current_player_index = current_player_index
+		self.spice_in_silo = spice_in_silo
+		self.game_ended = game_ended
+		self.available_actions = available_actions
+		self.zobrist_hash = zobrist_hash
+		# Pairs of players and their state before the action, limited to the players affected by it
+		self.player_states = player_states
+		# State of the random number generator of the game before the action, None unless the action might roll action types
+		self.random_state = random_state
 
 class ThumperGame:
 	PRINT_END_OF_GAME_STATS = False
+	# Round, first player, current player, spice in silo, game ended, available actions bitmask, conflict IDs and the state of each player
+	STATE_STRUCT = struct.Struct("<4h?I" + Constant.MAX_ROUNDS * "B" + Constant.PLAYER_COUNT * ThumperPlayer.STATE_FORMAT)
 
 	players: list[ThumperPlayer] | None
 	round: int | None
@@ -15,8 +35,13 @@ class ThumperGame:
 	current_player: ThumperPlayer | None
 	spice_in_silo: int | None
 	game_ended: bool | None
+	# Bitmask of the actions that have not been taken yet this round, see ACTION_BITS
+	available_actions: int | None
+	zobrist_hash: int | None
+	random: random.Random
 
-	def __init__(self):
+	def __init__(self, seed: int | None = None):
+		self.random = random.Random(seed)
 		self.players = None
 		self.round = None
 		self.first_player_index = None
@@ -24,41 +49,25 @@ class ThumperGame:
 		self.current_player = None
 		self.spice_in_silo = None
 		self.game_ended = None
+		self.available_actions = None
+		self.zobrist_hash = None
 		self.reset()
 
+	# Ranks the players by victory points, spice, solari, influence and troops in their garrison, remaining ties are broken by index
 	def get_ranked_players(self) -> list[ThumperPlayer]:
-		def compare_int(x: int, y: int) -> int:
-			if x < y:
-				return 1
-			elif x > y:
-				return -1
-			else:
-				return 0
-
-		def compare(p1: ThumperPlayer, p2: ThumperPlayer) -> int:
-			victory_points = compare_int(p1.victory_points, p2.victory_points)
-			spice = compare_int(p1.spice, p2.spice)
-			solari = compare_int(p1.solari, p2.solari)
-			influence = compare_int(p1.influence, p2.influence)
-			troops = compare_int(p1.troops_garrison, p2.troops_garrison)
-			tiebreakers = [
-				victory_points,
-				spice,
-				solari,
-				influence,
-				troops
-			]
-			for value in tiebreakers:
-				if value != 0:
-					return value
-			return 0
-
-		players = self.players[:]
-		sorted(players, key=cmp_to_key(compare))
-		return players
-
-	def reset(self) -> None:
-		self.players = [ThumperPlayer() for _ in range(Constant.PLAYER_COUNT)]
+		return sorted(self.players, key=_get_rank_key, reverse=True)
+
+	# Returns the rank of each player (0 for the winner), indexed by player index
+	def get_player_ranks(self) -> list[int]:
+		ranks = Constant.PLAYER_COUNT * [0]
+		for rank, player in enumerate(self.get_ranked_players()):
+			ranks[player.index] = rank
+		return ranks
+
+	def reset(self, seed: int | None = None) -> None:
+		if seed is not None:
+			self.random.seed(seed)
+		self.players = [ThumperPlayer(i, self.random) for i in range(Constant.PLAYER_COUNT)]
 		# The current round (1 - 8)
 		self.round = 1
 		# The player who was the first player in the current round, as an index into players
@@ -70,53 +79,193 @@ class ThumperGame:
 		self.game_ended = False
 		self._reset_available_actions()
 		self._set_conflict_rewards()
+		self.zobrist_hash = self._compute_zobrist_hash()
+
+	# Hash of the state of the game including all players, which is identical for positions reached through different move orders
+	def get_zobrist_hash(self) -> int:
+		zobrist_hash = self.zobrist_hash
+		for player in self.players:
+			zobrist_hash ^= player.zobrist_hash
+		return zobrist_hash
+
+	# Returns a compact, canonical encoding of the state of the game that can be passed to restore
+	def snapshot(self) -> bytes:
+		state = (
+			self.round,
+			self.first_player_index,
+			self.current_player_index,
+			self.spice_in_silo,
+			self.game_ended,
+			self.available_actions
+		)
+		state += tuple(conflict.id for conflict in self.conflicts)
+		for player in self.players:
+			state += player.get_state()
+		return self.STATE_STRUCT.pack(*state)
+
+	def restore(self, snapshot: bytes) -> None:
+		state = self.STATE_STRUCT.unpack(snapshot)
+		(
+			self.round,
+			self.first_player_index,
+			self.current_player_index,
+			self.spice_in_silo,
+			self.game_ended,
+			self.available_actions
+		) = state[:6]
+		offset = 6 + Constant.MAX_ROUNDS
+		self.conflicts = [CONFLICTS[id] for id in state[6:offset]]
+		if self.players is None:
+			# Players are restored from the snapshot so there is no need to roll their action types
+			self.players = [ThumperPlayer.__new__(ThumperPlayer) for _ in range(Constant.PLAYER_COUNT)]
+			for i, player in enumerate(self.players):
+				player.index = i
+				player.random = self.random
+		player_state_size = len(state[offset:]) // Constant.PLAYER_COUNT
+		for player in self.players:
+			player.set_state(state[offset:offset + player_state_size])
+			offset += player_state_size
+		self.current_player = self.players[self.current_player_index]
+		self.zobrist_hash = self._compute_zobrist_hash()
+
+	# Performs the action with the specified index into ACTION_DEFINITIONS and returns a record that can be passed to undo
+	def apply(self, action_index: int) -> UndoRecord:
+		definition = ACTION_DEFINITIONS[action_index]
+		players = self._get_affected_players(definition)
+		player_states = [(player, player.get_state()) for player in players]
+		# Action types are rolled when a swordmaster is recruited and when the round ends, which is only possible if all players are affected
+		if definition.action_enum == Action.SWORDMASTER or players is self.players:
+			random_state = self.random.getstate()
+		else:
+			random_state = None
+		record = UndoRecord(
+			self.round,
+			self.first_player_index,
+			self.current_player_index,
+			self.spice_in_silo,
+			self.game_ended,
+			self.available_actions,
+			self.zobrist_hash,
+			player_states,
+			random_state
+		)
+		perform_action(self, action_index)
+		return record
+
+	# Reverts the action that returned the record, which must be the most recent action that has not been undone yet
+	def undo(self, record: UndoRecord) -> None:
+		self.round = record.round
+		self.first_player_index = record.first_player_index
+		self.current_player_index = record.current_player_index
+		self.current_player = self.players[self.current_player_index]
+		self.spice_in_silo = record.spice_in_silo
+		self.game_ended = record.game_ended
+		self.available_actions = record.available_actions
+		self.zobrist_hash = record.zobrist_hash
+		for player, state in record.player_states:
+			player.set_state(state)
+		if record.random_state is not None:
+			self.random.setstate(record.random_state)
+
+	# The clone gets a copy of the random number generator unless it is shared, in which case both games draw from the same one
+	def clone(self, share_random: bool = False) -> "ThumperGame":
+		if share_random:
+			game_random = self.random
+		else:
+			game_random = random.Random()
+			game_random.setstate(self.random.getstate())
+		return ThumperGame.from_snapshot(self.snapshot(), game_random=game_random)
+
+	@staticmethod
+	def from_snapshot(snapshot: bytes, seed: int | None = None, game_random: random.Random | None = None) -> "ThumperGame":
+		game = ThumperGame.__new__(ThumperGame)
+		game.random = random.Random(seed) if game_random is None else game_random
+		game.players = None
+		game.restore(snapshot)
+		return game
+
+	def is_action_available(self, action: Action) -> bool:
+		return self.available_actions & ACTION_BITS[action] != 0
+
+	# Returns a bitmask with bit i set if the current player can perform the action with index i in ACTION_DEFINITIONS
+	def legal_action_bits(self) -> int:
+		player = self.current_player
+		if self.game_ended or player.agents_left <= 0:
+			return 0
+		legal_actions = get_available_action_mask(self.available_actions)
+		legal_actions &= ACTION_TYPE_MASKS[player.get_action_type_bits()]
+		legal_actions &= SPICE_MASKS[min(player.spice, len(SPICE_MASKS) - 1)]
+		legal_actions &= SOLARI_MASKS[min(player.solari, len(SOLARI_MASKS) - 1)]
+		legal_actions &= GARRISON_MASKS[min(player.troops_garrison, len(GARRISON_MASKS) - 1)]
+		if player.palace:
+			legal_actions &= ~ACTION_ENUM_MASKS[Action.CONSTRUCT_PALACE]
+		if player.holtzman_shield:
+			legal_actions &= ~ACTION_ENUM_MASKS[Action.HOLTZMAN_SHIELD]
+		if player.swordmaster:
+			legal_actions &= ~ACTION_ENUM_MASKS[Action.SWORDMASTER]
+		for i in range(Constant.PLAYER_COUNT):
+			target = self.players[i]
+			if target is player or target.troops_garrison == 0:
+				legal_actions &= ~STONE_BURNER_MASKS[i]
+		return legal_actions
+
+	def legal_action_mask(self) -> list[bool]:
+		legal_actions = self.legal_action_bits()
+		return [legal_actions >> i & 1 == 1 for i in range(ACTION_COUNT)]
+
+	# Returns the indexes into ACTION_DEFINITIONS of all actions the current player can perform
+	def get_legal_actions(self) -> list[int]:
+		return list(get_action_indices(self.legal_action_bits()))
+
+	# Reshuffles the conflicts of the following rounds within their levels, since players only know the conflict of the current round
+	def shuffle_hidden_conflicts(self) -> None:
+		for start, end in CONFLICT_LEVEL_RANGES:
+			start = max(start, self.round)
+			if start < end:
+				conflicts = self.conflicts[start:end]
+				self.random.shuffle(conflicts)
+				for i, conflict in enumerate(conflicts, start):
+					self.zobrist_hash ^= CONFLICT_KEYS[i][self.conflicts[i].id] ^ CONFLICT_KEYS[i][conflict.id]
+					self.conflicts[i] = conflict
 
 	def construct_palace(self) -> None:
 		self._check_game_ended()
 		if self.current_player.palace:
 			raise ThumperError("Player has already constructed their palace")
 		self._perform_action(ActionType.ECONOMIC, Action.CONSTRUCT_PALACE, solari=Cost.CONSTRUCT_PALACE)
-		self.current_player.palace = True
+		self._construct_palace_effect()
 		self._next_turn()
 
 	def harvester(self) -> None:
 		self._check_game_ended()
 		self._perform_action(ActionType.ECONOMIC, Action.HARVESTER)
-		self.current_player.gain_spice(3)
+		self._harvester_effect()
 		self._next_turn()
 
 	def refinery(self) -> None:
 		self._check_game_ended()
 		self._perform_action(ActionType.ECONOMIC, Action.REFINERY)
-		self.current_player.gain_spice(2)
-		self.current_player.gain_solari(1)
+		self._refinery_effect()
 		self._next_turn()
 
 	def spice_silo(self) -> None:
 		self._check_game_ended()
 		self._perform_action(ActionType.ECONOMIC, Action.SPICE_SILO)
-		self.current_player.gain_spice(self.spice_in_silo)
+		self._spice_silo_effect()
 		self._next_turn()
 
 	def sell_melange(self, amount: int) -> None:
 		self._check_game_ended()
-		match amount:
-			case 1:
-				solari = 3
-			case 2:
-				solari = 6
-			case 3:
-				solari = 8
-			case _:
-				raise ThumperError("Invalid amount of spice specified")
+		if amount not in Constant.SELL_MELANGE_SOLARI:
+			raise ThumperError("Invalid amount of spice specified")
 		self._perform_action(ActionType.ECONOMIC, Action.SELL_MELANGE, spice=amount)
-		self.current_player.gain_solari(solari)
+		self._sell_melange_effect(amount)
 		self._next_turn()
 
 	def secure_contract(self) -> None:
 		self._check_game_ended()
 		self._perform_action(ActionType.ECONOMIC, Action.SECURE_CONTRACT)
-		self.current_player.gain_solari(3)
+		self._secure_contract_effect()
 		self._next_turn()
 
 	def holtzman_shield(self) -> None:
@@ -124,8 +273,7 @@ class ThumperGame:
 		if self.current_player.holtzman_shield:
 			raise ThumperError("Player has already purchased Holtzman Shield upgrade")
 		self._perform_action(ActionType.MILITARY, Action.HOLTZMAN_SHIELD, spice=Cost.HOLTZMAN_SHIELD)
-		self.current_player.holtzman_shield = True
-		self.current_player.troops_garrison += 1
+		self._holtzman_shield_effect()
 		self._next_turn()
 
 	# target is the ID of the target player (1 - 4)
@@ -138,34 +286,27 @@ class ThumperGame:
 		if target_player.troops_garrison == 0 and target_player.troops_deployed == 0:
 			raise ThumperError("Stone Burner can only be used against players that have at least one troop")
 		self._perform_action(ActionType.MILITARY, Action.STONE_BURNER, spice=Cost.STONE_BURNER)
-		troops_to_kill = 4
-		while troops_to_kill > 0 and target_player.troops_deployed > 0:
-			target_player.troops_deployed -= 1
-			troops_to_kill -= 1
-		while troops_to_kill > 0 and target_player.troops_garrison > 0:
-			target_player.troops_garrison -= 1
-			troops_to_kill -= 1
-		self.current_player.influence -= 1
+		self._stone_burner_effect(target)
 		self._next_turn()
 
 	def hire_mercenaries(self, troops_deployed: int) -> None:
 		self._check_game_ended()
 		self._check_troops(Constant.HIRE_MERCENARIES_TROOPS_PRODUCED, troops_deployed, Constant.HIRE_MERCENARIES_DEPLOYMENT_LIMIT)
 		self._perform_action(ActionType.MILITARY, Action.HIRE_MERCENARIES, solari=Cost.HIRE_MERCENARIES)
-		self._produce_and_deploy_troops(Constant.HIRE_MERCENARIES_TROOPS_PRODUCED, troops_deployed)
+		self._hire_mercenaries_effect(troops_deployed)
 		self._next_turn()
 
 	def quick_strike(self, troops_deployed: int) -> None:
 		self._check_game_ended()
 		self._check_troops(Constant.QUICK_STRIKE_TROOPS_PRODUCED, troops_deployed, Constant.QUICK_STRIKE_DEPLOYMENT_LIMIT)
 		self._perform_action(ActionType.MILITARY, Action.QUICK_STRIKE)
-		self._produce_and_deploy_troops(Constant.QUICK_STRIKE_TROOPS_PRODUCED, troops_deployed)
+		self._quick_strike_effect(troops_deployed)
 		self._next_turn()
 
 	def recruitment_center(self) -> None:
 		self._check_game_ended()
 		self._perform_action(ActionType.MILITARY, Action.RECRUITMENT_CENTER)
-		self.current_player.troops_garrison += 1
+		self._recruitment_center_effect()
 		self._next_turn()
 
 	def troop_transports(self, troops_deployed: int) -> None:
@@ -173,15 +314,13 @@ class ThumperGame:
 		self._check_garrison()
 		self._check_troops(Constant.TROOP_TRANSPORTS_TROOPS_PRODUCED, troops_deployed, Constant.TROOP_TRANSPORTS_DEPLOYMENT_LIMIT)
 		self._perform_action(ActionType.MILITARY, Action.TROOP_TRANSPORTS)
-		self._deploy_troops(troops_deployed)
+		self._troop_transports_effect(troops_deployed)
 		self._next_turn()
 
 	def loot_villages(self) -> None:
 		self._check_game_ended()
 		self._perform_action(ActionType.MILITARY, Action.LOOT_VILLAGES)
-		self.current_player.gain_spice(1)
-		self.current_player.gain_solari(4)
-		self.current_player.influence -= 1
+		self._loot_villages_effect()
 		self._next_turn()
 
 	def swordmaster(self) -> None:
@@ -189,22 +328,19 @@ class ThumperGame:
 		if self.current_player.swordmaster:
 			raise ThumperError("Player already recruited their swordmaster")
 		self._perform_action(ActionType.POLITICAL, Action.SWORDMASTER)
-		self.current_player.swordmaster = True
-		self.current_player.agents_left += 1
-		self.current_player.add_action_type()
+		self._swordmaster_effect()
 		self._next_turn()
 
 	def sardaukar(self) -> None:
 		self._check_game_ended()
 		self._perform_action(ActionType.POLITICAL, Action.SARDAUKAR, spice=Cost.SARDAUKAR)
-		self.current_player.influence += 1
-		self.current_player.troops_garrison += 4
+		self._sardaukar_effect()
 		self._next_turn()
 
 	def audience_with_emperor(self) -> None:
 		self._check_game_ended()
 		self._perform_action(ActionType.POLITICAL, Action.AUDIENCE_WITH_EMPEROR, spice=Cost.AUDIENCE_WITH_EMPEROR)
-		self.current_player.influence += 2
+		self._audience_with_emperor_effect()
 		self._next_turn()
 
 	def mobilization(self, troops_deployed: int) -> None:
@@ -212,31 +348,60 @@ class ThumperGame:
 		self._check_garrison()
 		self._check_troops(Constant.MOBILIZATION_TROOPS_PRODUCED, troops_deployed, Constant.MOBILIZATION_DEPLOYMENT_LIMIT)
 		self._perform_action(ActionType.POLITICAL, Action.MOBILIZATION, solari=Cost.MOBILIZATION)
-		self.current_player.influence += 1
-		self._deploy_troops(troops_deployed)
+		self._mobilization_effect(troops_deployed)
 		self._next_turn()
 
 	def seek_allies(self) -> None:
 		self._check_game_ended()
 		self._perform_action(ActionType.POLITICAL, Action.SEEK_ALLIES, solari=Cost.SEEK_ALLIES)
-		self.current_player.influence += 1
+		self._seek_allies_effect()
 		self._next_turn()
 
 	# action_type is the desired action type to add
 	def political_maneuvering(self, action_type: ActionType) -> None:
 		self._check_game_ended()
-		actions = self.current_player.actions
 		if type(action_type) is not ActionType:
 			raise ThumperError("Action type is not an action type enum")
 		self._perform_action(ActionType.POLITICAL, Action.POLITICAL_MANEUVERING)
-		self.current_player.gain_solari(1)
-		actions.append(action_type)
+		self._political_maneuvering_effect(action_type)
 		self._next_turn()
 
 	def pass_turn(self) -> None:
 		self._check_game_ended()
 		self._next_turn()
 
+	# Performs the action with the specified index into ACTION_DEFINITIONS without checking whether it is legal
+	# Only use this for actions taken from legal_action_bits, illegal actions corrupt the state of the game
+	def apply_unchecked(self, action_index: int) -> None:
+		action_type, action_bit, action_key, spice, solari, effect, argument = UNCHECKED_ACTIONS[action_index]
+		if action_type is not None:
+			self._take_action(action_type, action_bit, action_key, spice, solari)
+		effect(self, argument)
+		self._advance_turn()
+
+	# Plays the game to the end without going through the checked action methods
+	# policy is called with the game and its legal_action_bits and returns an action index, random actions are performed if it is None
+	def play(self, policy: Callable[["ThumperGame", int], int] | None = None) -> None:
+		while not self.game_ended:
+			if policy is None:
+				action = self.random.choice(get_action_indices(self.legal_action_bits()))
+			else:
+				action = policy(self, self.legal_action_bits())
+			self.apply_unchecked(action)
+
+	# Plays n_games games from the current state to the end and restores the state after each of them
+	# Returns the final victory points and ranks (0 for the winner) of each player as arrays of the shape (n_games, PLAYER_COUNT)
+	def playout(self, policy: Callable[["ThumperGame", int], int] | None = None, n_games: int = 1) -> tuple[np.ndarray, np.ndarray]:
+		scores = np.zeros((n_games, Constant.PLAYER_COUNT), dtype=np.int16)
+		ranks = np.zeros((n_games, Constant.PLAYER_COUNT), dtype=np.int8)
+		snapshot = self.snapshot()
+		for i in range(n_games):
+			self.play(policy)
+			scores[i] = [player.victory_points for player in self.players]
+			ranks[i] = self.get_player_ranks()
+			self.restore(snapshot)
+		return scores, ranks
+
 	def construct_palace_enabled(self) -> bool:
 		return not self.current_player.palace
 
@@ -262,24 +427,125 @@ class ThumperGame:
 	def swordmaster_enabled(self) -> bool:
 		return not self.current_player.swordmaster
 
+	# The effects of the actions, which are shared by the checked methods and apply_unchecked
+	# They are called after the costs of the action have been paid and take the argument of the action, if any
+	def _construct_palace_effect(self, argument=None) -> None:
+		self.current_player.construct_palace()
+
+	def _harvester_effect(self, argument=None) -> None:
+		self.current_player.gain_spice(3)
+
+	def _refinery_effect(self, argument=None) -> None:
+		self.current_player.gain_spice(2)
+		self.current_player.gain_solari(1)
+
+	def _spice_silo_effect(self, argument=None) -> None:
+		self.current_player.gain_spice(self.spice_in_silo)
+
+	def _sell_melange_effect(self, amount: int) -> None:
+		self.current_player.gain_solari(Constant.SELL_MELANGE_SOLARI[amount])
+
+	def _secure_contract_effect(self, argument=None) -> None:
+		self.current_player.gain_solari(3)
+
+	def _holtzman_shield_effect(self, argument=None) -> None:
+		self.current_player.purchase_holtzman_shield()
+		self.current_player.gain_troops(1)
+
+	def _stone_burner_effect(self, target: int) -> None:
+		self.players[target - 1].lose_troops(4)
+		self.current_player.gain_influence(-1)
+
+	def _hire_mercenaries_effect(self, troops_deployed: int) -> None:
+		self.current_player.gain_troops(Constant.HIRE_MERCENARIES_TROOPS_PRODUCED)
+		self.current_player.deploy_troops(troops_deployed)
+
+	def _quick_strike_effect(self, troops_deployed: int) -> None:
+		self.current_player.gain_troops(Constant.QUICK_STRIKE_TROOPS_PRODUCED)
+		self.current_player.deploy_troops(troops_deployed)
+
+	def _recruitment_center_effect(self, argument=None) -> None:
+		self.current_player.gain_troops(1)
+
+	def _troop_transports_effect(self, troops_deployed: int) -> None:
+		self.current_player.deploy_troops(troops_deployed)
+
+	def _loot_villages_effect(self, argument=None) -> None:
+		self.current_player.gain_spice(1)
+		self.current_player.gain_solari(4)
+		self.current_player.gain_influence(-1)
+
+	def _swordmaster_effect(self, argument=None) -> None:
+		self.current_player.recruit_swordmaster()
+
+	def _sardaukar_effect(self, argument=None) -> None:
+		self.current_player.gain_influence(1)
+		self.current_player.gain_troops(4)
+
+	def _audience_with_emperor_effect(self, argument=None) -> None:
+		self.current_player.gain_influence(2)
+
+	def _mobilization_effect(self, troops_deployed: int) -> None:
+		self.current_player.gain_influence(1)
+		self.current_player.deploy_troops(troops_deployed)
+
+	def _seek_allies_effect(self, argument=None) -> None:
+		self.current_player.gain_influence(1)
+
+	def _political_maneuvering_effect(self, action_type: ActionType) -> None:
+		self.current_player.gain_solari(1)
+		self.current_player.add_action_type(action_type)
+
+	def _pass_turn_effect(self, argument=None) -> None:
+		pass
+
+	def _get_affected_players(self, definition: ActionDefinition) -> list[ThumperPlayer]:
+		other_players = [player for player in self.players if player is not self.current_player]
+		if all(player.agents_left == 0 for player in other_players):
+			# The action might end the round, which affects all players
+			return self.players
+		players = [self.current_player]
+		if definition.action_enum == Action.STONE_BURNER:
+			players.append(self.players[definition.argument - 1])
+		return players
+
+	def _set_current_player(self, player_index: int) -> None:
+		self.zobrist_hash ^= CURRENT_PLAYER_KEYS[self.current_player_index] ^ CURRENT_PLAYER_KEYS[player_index]
+		self.current_player_index = player_index
+		self.current_player = self.players[player_index]
+
+	def _compute_zobrist_hash(self) -> int:
+		zobrist_hash = ROUND_KEYS[self.round] ^ FIRST_PLAYER_KEYS[self.first_player_index] ^ CURRENT_PLAYER_KEYS[self.current_player_index] ^ SPICE_IN_SILO_KEYS[self.spice_in_silo]
+		if self.game_ended:
+			zobrist_hash ^= GAME_ENDED_KEY
+		for action, bit in ACTION_BITS.items():
+			if self.available_actions & bit:
+				zobrist_hash ^= ACTION_KEYS[action]
+		for i, conflict in enumerate(self.conflicts):
+			zobrist_hash ^= CONFLICT_KEYS[i][conflict.id]
+		return zobrist_hash
+
 	def _reset_available_actions(self) -> None:
-		self.available_actions = list(Action)
+		self.available_actions = ALL_AVAILABLE_ACTIONS
 
 	def _perform_action(self, action_type: ActionType, action: Action, spice: int = 0, solari: int = 0) -> None:
 		if self.game_ended:
 			raise ThumperError("Unable to perform action, the game has already ended")
-		if action_type not in self.current_player.actions:
+		if not self.current_player.has_action_type(action_type):
 			raise ThumperError(f"Action \"{ActionType(action_type).name}\" is not available for this player")
-		elif action not in self.available_actions:
+		elif not self.is_action_available(action):
 			raise ThumperError(f"Action \"{Action(action).name}\" is not available anymore")
 		if self.current_player.spice < spice:
 			raise ThumperError(f"Player has only {self.current_player.spice} spice which is not enough to perform this action")
 		if self.current_player.solari < solari:
 			raise ThumperError(f"Player has only {self.current_player.solari} solari which is not enough to perform this action")
-		self.current_player.actions.remove(action_type)
-		self.available_actions.remove(action)
-		self.current_player.spice -= spice
-		self.current_player.solari -= solari
+		self._take_action(action_type, ACTION_BITS[action], ACTION_KEYS[action], spice, solari)
+
+	def _take_action(self, action_type: ActionType, action_bit: int, action_key: int, spice: int, solari: int) -> None:
+		self.current_player.remove_action_type(action_type)
+		self.available_actions &= ~action_bit
+		self.zobrist_hash ^= action_key
+		self.current_player.pay(spice, solari)
 
 	def _check_game_ended(self) -> None:
 		if self.game_ended:
@@ -295,45 +561,45 @@ class ThumperGame:
 		if self.current_player.troops_garrison + troops_produced < troops_deployed:
 			raise ThumperError("Not enough troops available")
 
-	def _produce_and_deploy_troops(self, troops_produced: int, troops_deployed: int) -> None:
-		self.current_player.troops_garrison += troops_produced
-		self._deploy_troops(troops_deployed)
-
-	def _deploy_troops(self, troops_deployed: int) -> None:
-		if self.current_player.troops_garrison < troops_deployed:
-			raise ThumperError("Not enough troops available")
-		self.current_player.troops_garrison -= troops_deployed
-		self.current_player.troops_deployed += troops_deployed
-
 	def _next_turn(self) -> None:
 		if self.current_player.agents_left <= 0:
 			raise ThumperError("Performed an action even though the player had no actions left")
+		self._advance_turn()
+
+	def _advance_turn(self) -> None:
 		self.current_player.take_turn()
 		for i in range(Constant.PLAYER_COUNT):
 			player_index = (self.current_player_index + 1 + i) % Constant.PLAYER_COUNT
 			player = self.players[player_index]
 			if player.agents_left > 0:
 				# There is still a player who has an agent left
-				self.current_player = player
-				self.current_player_index = player_index
+				self._set_current_player(player_index)
 				self._update_victory_points()
 				return
 		# There are no players with any agents left, resolve the conflict
 		self._resolve_conflict()
 		if self.round < Constant.MAX_ROUNDS:
+			self.zobrist_hash ^= ROUND_KEYS[self.round] ^ ROUND_KEYS[self.round + 1]
 			self.round += 1
-			self.first_player_index = (self.first_player_index + 1) % Constant.PLAYER_COUNT
-			self.current_player_index = self.first_player_index
-			self.current_player = self.players[self.current_player_index]
-			if Action.SPICE_SILO in self.available_actions:
-				self.spice_in_silo = min(self.spice_in_silo + 1, Constant.MAX_SPICE_SILO)
+			first_player_index = (self.first_player_index + 1) % Constant.PLAYER_COUNT
+			self.zobrist_hash ^= FIRST_PLAYER_KEYS[self.first_player_index] ^ FIRST_PLAYER_KEYS[first_player_index]
+			self.first_player_index = first_player_index
+			self._set_current_player(self.first_player_index)
+			if self.is_action_available(Action.SPICE_SILO):
+				spice_in_silo = min(self.spice_in_silo + 1, Constant.MAX_SPICE_SILO)
 			else:
-				self.spice_in_silo = 1
+				spice_in_silo = 1
+			self.zobrist_hash ^= SPICE_IN_SILO_KEYS[self.spice_in_silo] ^ SPICE_IN_SILO_KEYS[spice_in_silo]
+			self.spice_in_silo = spice_in_silo
+			for action, bit in ACTION_BITS.items():
+				if not self.available_actions & bit:
+					self.zobrist_hash ^= ACTION_KEYS[action]
 			self._reset_available_actions()
 			for player in self.players:
 				player.reset()
 		else:
 			self.game_ended = True
+			self.zobrist_hash ^= GAME_ENDED_KEY
 		self._update_victory_points()
 		if self.game_ended:
 			self._on_game_end()
@@ -379,81 +645,11 @@ class ThumperGame:
 						player.apply_reward(reward)
 
 	def _set_conflict_rewards(self) -> None:
-		rewards1 = [
-			ConflictReward(0, 1, 0, 2),
-			ConflictReward(0, 0, 0, 3),
-			ConflictReward(0, 0, 0, 2)
-		]
-		rewards2 = [
-			ConflictReward(1, 0, 0, 0),
-			ConflictReward(0, 0, 1, 2),
-			ConflictReward(0, 0, 1, 0)
-		]
-		rewards3 = [
-			ConflictReward(0, 0, 0, 6),
-			ConflictReward(0, 0, 0, 4),
-			ConflictReward(0, 0, 0, 2)
-		]
-		rewards4 = [
-			ConflictReward(1, 0, 0, 0),
-			ConflictReward(0, 0, 2, 0),
-			ConflictReward(0, 0, 0, 1)
-		]
-		rewards5 = [
-			ConflictReward(0, 2, 0, 0),
-			ConflictReward(0, 0, 2, 0),
-			ConflictReward(0, 0, 1, 0)
-		]
-		rewards6 = [
-			ConflictReward(1, 0, 0, 0),
-			ConflictReward(0, 0, 2, 0),
-			ConflictReward(0, 0, 1, 0)
-		]
-		rewards7 = [
-			ConflictReward(1, 0, 3, 0),
-			ConflictReward(0, 0, 5, 0),
-			ConflictReward(0, 0, 3, 0)
-		]
-		rewards8 = [
-			ConflictReward(2, 0, 0, 0),
-			ConflictReward(0, 0, 5, 0),
-			ConflictReward(0, 0, 3, 0)
-		]
-		rewards9 = [
-			ConflictReward(0, 2, 3, 0),
-			ConflictReward(0, 1, 5, 0),
-			ConflictReward(0, 0, 3, 0)
-		]
-		rewards10 = [
-			ConflictReward(2, 0, 0, 0),
-			ConflictReward(1, 0, 0, 0),
-			ConflictReward(0, 0, 3, 0)
-		]
-		level1 = [
-			Conflict(1, rewards1)
-		]
-		level2 = [
-			Conflict(2, rewards2),
-			Conflict(3, rewards3),
-			Conflict(4, rewards4),
-			Conflict(5, rewards5),
-			Conflict(6, rewards6)
-		]
-		level3 = [
-			Conflict(7, rewards7),
-			Conflict(8, rewards8),
-			Conflict(9, rewards9),
-			Conflict(10, rewards10)
-		]
-		levels = [
-			level1,
-			level2,
-			level3
-		]
-		self.conflicts = []
-		for level in levels:
-			random.shuffle(level)
-			self.conflicts += level
+		self.conflicts = list(CONFLICT_DECK)
+		for start, end in CONFLICT_LEVEL_RANGES:
+			conflicts = self.conflicts[start:end]
+			self.random.shuffle(conflicts)
+			self.conflicts[start:end] = conflicts
 		assert len(self.conflicts) == Constant.MAX_ROUNDS
 
 	def _update_victory_points(self) -> None:
@@ -482,4 +678,83 @@ class ThumperGame:
 				player2.victory_points += 1
 		elif player1.influence >= min_influence and player2.influence >= min_influence:
 			player1.victory_points += 1
-			player2.victory_points += 1
\ No newline at end of file
+			player2.victory_points += 1
+
+def _get_rank_key(player: ThumperPlayer) -> tuple[int, int, int, int, int]:
+	return player.victory_points, player.spice, player.solari, player.influence, player.troops_garrison
+
+# Returns an array of the shape (len(games), ACTION_COUNT) with the legal action mask of each game
+def legal_action_masks(games: list[ThumperGame]) -> np.ndarray:
+	legal_actions = np.array([game.legal_action_bits() for game in games], dtype=np.uint64)
+	return (legal_actions[:, None] >> np.arange(ACTION_COUNT, dtype=np.uint64)) & 1 == 1
+
+# Maps the action enums in ACTION_DEFINITIONS to the methods performing them
+ACTION_METHODS = {
+	Action.CONSTRUCT_PALACE: ThumperGame.construct_palace,
+	Action.HARVESTER: ThumperGame.harvester,
+	Action.REFINERY: ThumperGame.refinery,
+	Action.SPICE_SILO: ThumperGame.spice_silo,
+	Action.SELL_MELANGE: ThumperGame.sell_melange,
+	Action.SECURE_CONTRACT: ThumperGame.secure_contract,
+	Action.HOLTZMAN_SHIELD: ThumperGame.holtzman_shield,
+	Action.STONE_BURNER: ThumperGame.stone_burner,
+	Action.HIRE_MERCENARIES: ThumperGame.hire_mercenaries,
+	Action.QUICK_STRIKE: ThumperGame.quick_strike,
+	Action.RECRUITMENT_CENTER: ThumperGame.recruitment_center,
+	Action.TROOP_TRANSPORTS: ThumperGame.troop_transports,
+	Action.LOOT_VILLAGES: ThumperGame.loot_villages,
+	Action.SWORDMASTER: ThumperGame.swordmaster,
+	Action.SARDAUKAR: ThumperGame.sardaukar,
+	Action.AUDIENCE_WITH_EMPEROR: ThumperGame.audience_with_emperor,
+	Action.MOBILIZATION: ThumperGame.mobilization,
+	Action.SEEK_ALLIES: ThumperGame.seek_allies,
+	Action.POLITICAL_MANEUVERING: ThumperGame.political_maneuvering,
+	None: ThumperGame.pass_turn
+}
+
+# Performs the action with the index into ACTION_DEFINITIONS by calling the method of the game with its argument, which raises ThumperError if it is not legal
+def perform_action(game: ThumperGame, action_index: int) -> None:
+	definition = ACTION_DEFINITIONS[action_index]
+	method = ACTION_METHODS[definition.action_enum]
+	if definition.argument is None:
+		method(game)
+	else:
+		method(game, definition.argument)
+
+# Maps the action enums in ACTION_DEFINITIONS to the methods applying their effects
+ACTION_EFFECTS = {
+	Action.CONSTRUCT_PALACE: ThumperGame._construct_palace_effect,
+	Action.HARVESTER: ThumperGame._harvester_effect,
+	Action.REFINERY: ThumperGame._refinery_effect,
+	Action.SPICE_SILO: ThumperGame._spice_silo_effect,
+	Action.SELL_MELANGE: ThumperGame._sell_melange_effect,
+	Action.SECURE_CONTRACT: ThumperGame._secure_contract_effect,
+	Action.HOLTZMAN_SHIELD: ThumperGame._holtzman_shield_effect,
+	Action.STONE_BURNER: ThumperGame._stone_burner_effect,
+	Action.HIRE_MERCENARIES: ThumperGame._hire_mercenaries_effect,
+	Action.QUICK_STRIKE: ThumperGame._quick_strike_effect,
+	Action.RECRUITMENT_CENTER: ThumperGame._recruitment_center_effect,
+	Action.TROOP_TRANSPORTS: ThumperGame._troop_transports_effect,
+	Action.LOOT_VILLAGES: ThumperGame._loot_villages_effect,
+	Action.SWORDMASTER: ThumperGame._swordmaster_effect,
+	Action.SARDAUKAR: ThumperGame._sardaukar_effect,
+	Action.AUDIENCE_WITH_EMPEROR: ThumperGame._audience_with_emperor_effect,
+	Action.MOBILIZATION: ThumperGame._mobilization_effect,
+	Action.SEEK_ALLIES: ThumperGame._seek_allies_effect,
+	Action.POLITICAL_MANEUVERING: ThumperGame._political_maneuvering_effect,
+	None: ThumperGame._pass_turn_effect
+}
+
+def _get_unchecked_actions() -> list[tuple]:
+	unchecked_actions = []
+	for definition in ACTION_DEFINITIONS:
+		# The Swordmaster requires the solari without actually costing any
+		solari = 0 if definition.action_enum == Action.SWORDMASTER else definition.solari
+		action = definition.action_enum
+		action_bit = None if action is None else ACTION_BITS[action]
+		action_key = None if action is None else ACTION_KEYS[action]
+		unchecked_actions.append((definition.action_type, action_bit, action_key, definition.spice, solari, ACTION_EFFECTS[action], definition.argument))
+	return unchecked_actions
+
+# Indexed like ACTION_DEFINITIONS, (action type, action bit, Zobrist key, spice paid, solari paid, effect, argument) as used by ThumperGame.apply_unchecked
+UNCHECKED_ACTIONS: Final[list[tuple]] = _get_unchecked_actions()
\ No newline at end of file
@@ -0,0 +1,138 @@
+from typing import Final
+import numpy as np
+from .constants import Constant
+from .batch import BatchedThumperGame
+from .game import ThumperGame
+from .player import ThumperPlayer
+
+# Observations consist of one-hot encodings of the current round and of the ID of the current conflict
+# They are followed by the state of each player, commencing with the observing player's, the others follow in the order of their indexes
+ROUND_OFFSET: Final[int] = 0
+CONFLICT_OFFSET: Final[int] = ROUND_OFFSET + Constant.MAX_ROUNDS
+PLAYER_OFFSET: Final[int] = CONFLICT_OFFSET + Constant.MAX_ROUNDS
+PLAYER_OBSERVATION_SIZE: Final[int] = 13
+OBSERVATION_SIZE: Final[int] = PLAYER_OFFSET + Constant.PLAYER_COUNT * PLAYER_OBSERVATION_SIZE
+
+def get_observation_nvec() -> list[int]:
+	# Current round (1 to 10), one-hot encoded, so 0 to 1 each
+	one_hot_encoding = Constant.MAX_ROUNDS * [2]
+	nvec = one_hot_encoding[:]
+	# Conflict reward
+	nvec += one_hot_encoding
+	for i in range(Constant.PLAYER_COUNT):
+		nvec += [
+			# Action type counts (0 - 4)
+			5,
+			5,
+			5,
+			# Spice (0 - 10+)
+			11,
+			# Solari (0 - 10+)
+			11,
+			# Troops in garrison (0 - 10+)
+			11,
+			# Troops deployed (0 - 10+)
+			11,
+			# Influence (-5 or less to 10+)
+			16,
+			# Swordmaster (0 to 1)
+			2,
+			# Palace (0 to 1)
+			2,
+			# Holtzman Shield (0 to 1)
+			2,
+			# Agents left (0 to 3)
+			4,
+			# Victory points (0 to 12)
+			13
+		]
+	assert len(nvec) == OBSERVATION_SIZE
+	return nvec
+
+def _get_seat_orders() -> np.ndarray:
+	seat_orders = []
+	for player_index in range(Constant.PLAYER_COUNT):
+		seat_orders.append([player_index] + [i for i in range(Constant.PLAYER_COUNT) if i != player_index])
+	return np.array(seat_orders, dtype=np.intp)
+
+# Indexed by the index of the observing player, the order in which the players appear in their observation
+SEAT_ORDERS: Final[np.ndarray] = _get_seat_orders()
+_ONE_HOT_VALUES: Final[np.ndarray] = np.arange(1, Constant.MAX_ROUNDS + 1)
+
+def _get_player_columns() -> np.ndarray:
+	player_columns = np.zeros((Constant.PLAYER_COUNT, Constant.PLAYER_COUNT, PLAYER_OBSERVATION_SIZE), dtype=np.intp)
+	for observer_index, seat_order in enumerate(SEAT_ORDERS):
+		for position, player_index in enumerate(seat_order):
+			offset = PLAYER_OFFSET + position * PLAYER_OBSERVATION_SIZE
+			player_columns[player_index, observer_index] = np.arange(offset, offset + PLAYER_OBSERVATION_SIZE)
+	return player_columns
+
+# Indexed by player index and the index of the observing player, the columns of the player's state in the observation
+PLAYER_COLUMNS: Final[np.ndarray] = _get_player_columns()
+_OBSERVER_INDICES: Final[np.ndarray] = np.arange(Constant.PLAYER_COUNT)[:, None]
+
+# Writes the one-hot encodings of the current round and conflict into out, an int8 array of the shape (PLAYER_OFFSET,)
+def write_round_observation(game: ThumperGame, out: np.ndarray) -> None:
+	out[:] = 0
+	out[ROUND_OFFSET + game.round - 1] = 1
+	out[CONFLICT_OFFSET + game.conflicts[game.round - 1].id - 1] = 1
+
+def _get_player_observation(player: ThumperPlayer) -> tuple[int, ...]:
+	economic, military, political = player.action_type_counts
+	return (
+		economic,
+		military,
+		political,
+		min(player.spice, 10),
+		min(player.solari, 10),
+		min(player.troops_garrison, 10),
+		min(player.troops_deployed, 10),
+		max(min(player.influence + 5, 15), 0),
+		player.swordmaster,
+		player.palace,
+		player.holtzman_shield,
+		player.agents_left,
+		player.victory_points
+	)
+
+# Writes the state of the player into their columns of the observations of all players
+# observations is an int8 array of the shape (PLAYER_COUNT, OBSERVATION_SIZE) with one row per observing player
+def write_player_observation(player: ThumperPlayer, observations: np.ndarray) -> None:
+	observations[_OBSERVER_INDICES, PLAYER_COLUMNS[player.index]] = _get_player_observation(player)
+
+# Writes the observations of all players into observations, an int8 array of the shape (PLAYER_COUNT, OBSERVATION_SIZE)
+# The state of each player is only encoded once, the rows of the observing players are permutations of the same encodings
+def write_observations(game: ThumperGame, observations: np.ndarray) -> None:
+	write_round_observation(game, observations[0, :PLAYER_OFFSET])
+	observations[1:, :PLAYER_OFFSET] = observations[0, :PLAYER_OFFSET]
+	player_observations = np.array([_get_player_observation(player) for player in game.players], dtype=np.int8)
+	observations[:, PLAYER_OFFSET:] = player_observations[SEAT_ORDERS].reshape(Constant.PLAYER_COUNT, -1)
+
+# Returns the observations of all players as a new int8 array of the shape (PLAYER_COUNT, OBSERVATION_SIZE)
+def get_observations(game: ThumperGame) -> np.ndarray:
+	observations = np.empty((Constant.PLAYER_COUNT, OBSERVATION_SIZE), dtype=np.int8)
+	write_observations(game, observations)
+	return observations
+
+# Writes the observation of the current player of each game into out, an int8 array of the shape (game.size, OBSERVATION_SIZE)
+# The observing player of each game can be specified with player_indices instead
+def write_batch_observations(game: BatchedThumperGame, out: np.ndarray, player_indices: np.ndarray | None = None) -> None:
+	if player_indices is None:
+		player_indices = game.current_player_index
+	games = np.arange(game.size)
+	out[:, ROUND_OFFSET:CONFLICT_OFFSET] = game.round[:, None] == _ONE_HOT_VALUES
+	conflict_ids = game.conflicts[games, game.round - 1]
+	out[:, CONFLICT_OFFSET:PLAYER_OFFSET] = conflict_ids[:, None] == _ONE_HOT_VALUES
+	players = (games[:, None], SEAT_ORDERS[player_indices])
+	player_observations = out[:, PLAYER_OFFSET:].reshape(game.size, Constant.PLAYER_COUNT, PLAYER_OBSERVATION_SIZE)
+	player_observations[..., 0:Constant.ACTION_TYPES] = game.actions[players]
+	player_observations[..., 3] = np.minimum(game.spice[players], 10)
+	player_observations[..., 4] = np.minimum(game.solari[players], 10)
+	player_observations[..., 5] = np.minimum(game.troops_garrison[players], 10)
+	player_observations[..., 6] = np.minimum(game.troops_deployed[players], 10)
+	player_observations[..., 7] = np.clip(game.influence[players] + 5, 0, 15)
+	player_observations[..., 8] = game.swordmaster[players]
+	player_observations[..., 9] = game.palace[players]
+	player_observations[..., 10] = game.holtzman_shield[players]
+	player_observations[..., 11] = game.agents_left[players]
+	player_observations[..., 12] = game.victory_points[players]
\ No newline at end of file
@@ -1,8 +1,40 @@
-import random
 from .constants import Constant, ActionType
+from .zobrist import ZobristField, PLAYER_KEYS, VALUE_MASK
+
+# Drawn from by the random number generator, which consumes the same random numbers as drawing from list(ActionType)
+_ACTION_TYPES = tuple(ActionType)
+_ACTION_TYPE_INDICES = tuple(range(Constant.ACTION_TYPES))
 
 class ThumperPlayer:
-	def __init__(self):
+	__slots__ = (
+		"index",
+		"random",
+		"spice",
+		"solari",
+		"troops_garrison",
+		"troops_deployed",
+		"influence",
+		"swordmaster",
+		"palace",
+		"holtzman_shield",
+		"agents_left",
+		"victory_points",
+		"conflict_victory_points",
+		"previous_victory_points",
+		"turns",
+		"spice_harvested",
+		"solari_earned",
+		"action_type_counts",
+		"zobrist_hash"
+	)
+
+	# Layout of the tuples returned by get_state, for use with the struct module
+	STATE_FORMAT = "5h3?7h3B"
+
+	def __init__(self, index, random):
+		self.index = index
+		# Random number generator of the game, used to roll action types
+		self.random = random
 		self.spice = 0
 		self.solari = 0
 		self.troops_garrison = Constant.INITIAL_TROOPS
@@ -18,21 +50,36 @@ class ThumperPlayer:
 		self.turns = 0
 		self.spice_harvested = 0
 		self.solari_earned = 0
-		self.actions = None
+		# Number of actions of each action type the player has left this round, indexed by ActionType.value - 1
+		self.action_type_counts = Constant.ACTION_TYPES * [0]
+		self.zobrist_hash = self.compute_zobrist_hash()
 		self.reset()
 
 	def reset(self):
-		self.agents_left = 3 if self.swordmaster else 2
+		agents_left = 3 if self.swordmaster else 2
+		self._update_hash(ZobristField.AGENTS_LEFT, self.agents_left, agents_left)
+		self.agents_left = agents_left
+		self._update_hash(ZobristField.TROOPS_DEPLOYED, self.troops_deployed, 0)
 		self.troops_deployed = 0
 		action_type_count = Constant.ACTION_TYPES
 		if self.swordmaster:
 			action_type_count += 1
-		self.actions = random.choices(list(ActionType), k=action_type_count)
+		action_type_counts = self.action_type_counts
+		for i in _ACTION_TYPE_INDICES:
+			self._update_action_type_hash(i, action_type_counts[i], 0)
+			action_type_counts[i] = 0
+		for i in self.random.choices(_ACTION_TYPE_INDICES, k=action_type_count):
+			action_type_counts[i] += 1
+		for i in _ACTION_TYPE_INDICES:
+			self._update_action_type_hash(i, 0, action_type_counts[i])
 
 	def apply_reward(self, reward):
+		self._update_hash(ZobristField.CONFLICT_VICTORY_POINTS, self.conflict_victory_points, self.conflict_victory_points + reward.victory_points)
 		self.conflict_victory_points += reward.victory_points
-		self.influence += reward.influence
+		self.gain_influence(reward.influence)
+		self._update_hash(ZobristField.SPICE, self.spice, reward.spice)
 		self.spice = reward.spice
+		self._update_hash(ZobristField.SOLARI, self.solari, reward.solari)
 		self.solari = reward.solari
 
 	def get_reward(self):
@@ -42,17 +89,156 @@ class ThumperPlayer:
 		return reward
 
 	def take_turn(self):
+		self._update_hash(ZobristField.AGENTS_LEFT, self.agents_left, self.agents_left - 1)
 		self.agents_left -= 1
 		self.turns += 1
 
 	def gain_spice(self, amount):
+		self._update_hash(ZobristField.SPICE, self.spice, self.spice + amount)
 		self.spice += amount
 		self.spice_harvested += amount
 
 	def gain_solari(self, amount):
+		self._update_hash(ZobristField.SOLARI, self.solari, self.solari + amount)
 		self.solari += amount
 		self.solari_earned += amount
 
-	def add_action_type(self):
-		action_type = random.choice(list(ActionType))
-		self.actions.append(action_type)
\ No newline at end of file
+	def pay(self, spice, solari):
+		self._update_hash(ZobristField.SPICE, self.spice, self.spice - spice)
+		self.spice -= spice
+		self._update_hash(ZobristField.SOLARI, self.solari, self.solari - solari)
+		self.solari -= solari
+
+	def gain_influence(self, amount):
+		self._update_hash(ZobristField.INFLUENCE, self.influence, self.influence + amount)
+		self.influence += amount
+
+	def gain_troops(self, amount):
+		self._update_hash(ZobristField.TROOPS_GARRISON, self.troops_garrison, self.troops_garrison + amount)
+		self.troops_garrison += amount
+
+	def deploy_troops(self, amount):
+		self.gain_troops(-amount)
+		self._update_hash(ZobristField.TROOPS_DEPLOYED, self.troops_deployed, self.troops_deployed + amount)
+		self.troops_deployed += amount
+
+	# Deployed troops are killed first, then the ones in the garrison
+	def lose_troops(self, amount):
+		troops_deployed = max(self.troops_deployed - amount, 0)
+		amount -= self.troops_deployed - troops_deployed
+		self._update_hash(ZobristField.TROOPS_DEPLOYED, self.troops_deployed, troops_deployed)
+		self.troops_deployed = troops_deployed
+		self.gain_troops(-min(amount, self.troops_garrison))
+
+	def construct_palace(self):
+		self._update_hash(ZobristField.PALACE, self.palace, True)
+		self.palace = True
+
+	def purchase_holtzman_shield(self):
+		self._update_hash(ZobristField.HOLTZMAN_SHIELD, self.holtzman_shield, True)
+		self.holtzman_shield = True
+
+	def recruit_swordmaster(self):
+		self._update_hash(ZobristField.SWORDMASTER, self.swordmaster, True)
+		self.swordmaster = True
+		self._update_hash(ZobristField.AGENTS_LEFT, self.agents_left, self.agents_left + 1)
+		self.agents_left += 1
+		self.add_action_type()
+
+	# Adds a random action type unless one is specified
+	def add_action_type(self, action_type=None):
+		if action_type is None:
+			action_type = self.random.choice(_ACTION_TYPES)
+		i = action_type.value - 1
+		self._update_action_type_hash(i, self.action_type_counts[i], self.action_type_counts[i] + 1)
+		self.action_type_counts[i] += 1
+
+	def remove_action_type(self, action_type):
+		i = action_type.value - 1
+		self._update_action_type_hash(i, self.action_type_counts[i], self.action_type_counts[i] - 1)
+		self.action_type_counts[i] -= 1
+
+	def has_action_type(self, action_type) -> bool:
+		return self.action_type_counts[action_type.value - 1] > 0
+
+	# Bitmask with bit ActionType.value - 1 set for each action type the player has left
+	def get_action_type_bits(self) -> int:
+		economic, military, political = self.action_type_counts
+		return (economic > 0) | (military > 0) << 1 | (political > 0) << 2
+
+	# Returns the action types the player has left, ordered by action type
+	def get_action_types(self) -> list[ActionType]:
+		action_types = []
+		for action_type, count in zip(ActionType, self.action_type_counts):
+			action_types += count * [action_type]
+		return action_types
+
+	def compute_zobrist_hash(self) -> int:
+		values = [
+			self.spice,
+			self.solari,
+			self.troops_garrison,
+			self.troops_deployed,
+			self.influence,
+			self.swordmaster,
+			self.palace,
+			self.holtzman_shield,
+			self.agents_left,
+			self.conflict_victory_points
+		]
+		values += self.action_type_counts
+		zobrist_hash = 0
+		for keys, value in zip(PLAYER_KEYS[self.index], values):
+			zobrist_hash ^= keys[value & VALUE_MASK]
+		return zobrist_hash
+
+	def get_state(self) -> tuple:
+		return (
+			self.spice,
+			self.solari,
+			self.troops_garrison,
+			self.troops_deployed,
+			self.influence,
+			self.swordmaster,
+			self.palace,
+			self.holtzman_shield,
+			self.agents_left,
+			self.victory_points,
+			self.conflict_victory_points,
+			self.previous_victory_points,
+			self.turns,
+			self.spice_harvested,
+			self.solari_earned,
+			*self.action_type_counts
+		)
+
+	def set_state(self, state: tuple) -> None:
+		(
+			self.spice,
+			self.solari,
+			self.troops_garrison,
+			self.troops_deployed,
+			self.influence,
+			self.swordmaster,
+			self.palace,
+			self.holtzman_shield,
+			self.agents_left,
+			self.victory_points,
+			self.conflict_victory_points,
+			self.previous_victory_points,
+			self.turns,
+			self.spice_harvested,
+			self.solari_earned,
+			economic,
+			military,
+			political
+		) = state
+		self.action_type_counts = [economic, military, political]
+		self.zobrist_hash = self.compute_zobrist_hash()
+
+	def _update_hash(self, field, old_value, new_value):
+		keys = PLAYER_KEYS[self.index][field]
+		self.zobrist_hash ^= keys[old_value & VALUE_MASK] ^ keys[new_value & VALUE_MASK]
+
+	def _update_action_type_hash(self, index, old_count, new_count):
+		self._update_hash(ZobristField.ACTION_TYPES + index, old_count, new_count)
\ No newline at end of file
@@ -46,7 +46,7 @@ class ThumperQt(QWidget):
 		else:
 			round_label = f"Round {self.game.round}"
 		self.current_round_label.setText(round_label)
-		action_enums = map(lambda action: action.name.lower(), self.game.current_player.actions)
+		action_enums = map(lambda action: action.name.lower(), self.game.current_player.get_action_types())
 		action_string = ", ".join(action_enums)
 		self.actions_label.setText(f"Available actions: {action_string}")
 
@@ -259,9 +259,9 @@ class ActionButton:
 	def update(self, game):
 		player = game.current_player
 		enabled = not game.game_ended
-		available = self.action_enum in game.available_actions
+		available = game.is_action_available(self.action_enum)
 		enabled = enabled and available
-		enabled = enabled and self.action_type in player.actions
+		enabled = enabled and player.has_action_type(self.action_type)
 		enabled = enabled and player.spice >= self.spice
 		enabled = enabled and player.solari >= self.solari
 		enabled = enabled and (self.enabled is None or self.enabled())
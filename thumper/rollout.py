@@ -0,0 +1,113 @@
+import argparse
+import random
+import time
+from typing import Callable
+import numpy as np
+from .constants import Constant, Action
+from .action import ACTION_DEFINITIONS, ACTION_COUNT, get_action_indices, get_action_mask_array
+from .game import ThumperGame
+from .error import ThumperError
+
+# Policies are called with the game and its legal_action_bits and return the index into ACTION_DEFINITIONS of the action to perform
+Policy = Callable[[ThumperGame, int], int]
+
+# Preferred actions of heuristic_policy, actions that deploy more troops are preferred over the same action deploying fewer
+HEURISTIC_PRIORITIES = {
+	Action.SWORDMASTER: 10,
+	Action.CONSTRUCT_PALACE: 9,
+	Action.AUDIENCE_WITH_EMPEROR: 8,
+	Action.SARDAUKAR: 7,
+	Action.SEEK_ALLIES: 6,
+	Action.HOLTZMAN_SHIELD: 5,
+	Action.HIRE_MERCENARIES: 5,
+	Action.MOBILIZATION: 5,
+	Action.SPICE_SILO: 4,
+	Action.QUICK_STRIKE: 4,
+	Action.TROOP_TRANSPORTS: 4,
+	Action.HARVESTER: 3,
+	Action.REFINERY: 3,
+	Action.SELL_MELANGE: 3,
+	Action.SECURE_CONTRACT: 3,
+	Action.RECRUITMENT_CENTER: 2,
+	Action.LOOT_VILLAGES: 2,
+	Action.STONE_BURNER: 1,
+	Action.POLITICAL_MANEUVERING: 1,
+	None: 0
+}
+
+def _get_heuristic_priorities() -> list[float]:
+	priorities = []
+	for definition in ACTION_DEFINITIONS:
+		priority = HEURISTIC_PRIORITIES[definition.action_enum]
+		if definition.deployment_limit is not None:
+			priority += definition.argument / (definition.deployment_limit + 1)
+		priorities.append(priority)
+	return priorities
+
+_PRIORITIES = _get_heuristic_priorities()
+
+def random_policy(game: ThumperGame, legal_actions: int) -> int:
+	return game.random.choice(get_action_indices(legal_actions))
+
+# Performs the legal action with the highest priority, ties are broken randomly
+def heuristic_policy(game: ThumperGame, legal_actions: int) -> int:
+	best_actions = []
+	best_priority = None
+	for i in range(ACTION_COUNT):
+		if legal_actions >> i & 1:
+			priority = _PRIORITIES[i]
+			if best_priority is None or priority > best_priority:
+				best_actions = [i]
+				best_priority = priority
+			elif priority == best_priority:
+				best_actions.append(i)
+	return game.random.choice(best_actions)
+
+# Turns a callback that takes the legal action mask as a boolean array of the shape (ACTION_COUNT,) into a policy
+def mask_policy(callback: Callable[[np.ndarray], int]) -> Policy:
+	def policy(game: ThumperGame, legal_actions: int) -> int:
+		return callback(get_action_mask_array(legal_actions).view(np.bool_))
+	return policy
+
+POLICIES: dict[str, Policy] = {
+	"random": random_policy,
+	"heuristic": heuristic_policy
+}
+
+def get_policy(policy: str | Policy | None) -> Policy | None:
+	if policy is None or callable(policy):
+		return policy
+	if policy not in POLICIES:
+		raise ThumperError(f"Unknown policy \"{policy}\"")
+	return POLICIES[policy]
+
+# Plays n_games complete games from newly reset states, with every player following the same policy
+# Returns the final victory points and ranks (0 for the winner) of each player as arrays of the shape (n_games, PLAYER_COUNT)
+def rollout(n_games: int, policy: str | Policy | None = None, seed: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+	policy = get_policy(policy)
+	seed_random = random.Random(seed)
+	game = ThumperGame()
+	scores = np.zeros((n_games, Constant.PLAYER_COUNT), dtype=np.int16)
+	ranks = np.zeros((n_games, Constant.PLAYER_COUNT), dtype=np.int8)
+	for i in range(n_games):
+		game.reset(seed_random.getrandbits(64))
+		game.play(policy)
+		scores[i] = [player.victory_points for player in game.players]
+		ranks[i] = game.get_player_ranks()
+	return scores, ranks
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Plays complete games on the engine and measures the number of games per second")
+	parser.add_argument("--games", type=int, default=1000, help="Number of games to play")
+	parser.add_argument("--policy", choices=list(POLICIES), default="random", help="Policy followed by all players")
+	parser.add_argument("--seed", type=int, default=None, help="Seed of the random number generator")
+	arguments = parser.parse_args()
+	start = time.perf_counter()
+	scores, ranks = rollout(arguments.games, arguments.policy, arguments.seed)
+	duration = time.perf_counter() - start
+	print(f"Played {arguments.games} games in {duration:.2f} s ({arguments.games / duration:.1f} games/s)")
+	print(f"Mean victory points by seat: {np.round(scores.mean(axis=0), 2).tolist()}")
+	print(f"Win rate by seat: {np.round((ranks == 0).mean(axis=0), 3).tolist()}")
+
+if __name__ == "__main__":
+	main()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from .action import ACTION_DEFINITIONS
+from .game import ThumperGame
+from .error import ThumperError
+
+# Scores of the players by rank at the end of a playout, the same proportions as raw_env.RANK_REWARDS
+RANK_SCORES = [1.0, 0.5, 0.25, 0.0]
+
+class SearchNode:
+	def __init__(self, player_index=None):
+		# The player who performed the action leading to this node
+		self.player_index = player_index
+		self.children = {}
+		self.visits = 0
+		self.score = 0.0
+		# Number of times this node could have been selected, since the legal actions depend on the action types rolled
+		self.availability = 0
+
+	def select_child(self, legal_actions, exploration):
+		best_action = None
+		best_child = None
+		best_value = None
+		for action in legal_actions:
+			child = self.children[action]
+			child.availability += 1
+			value = child.score / child.visits + exploration * math.sqrt(math.log(child.availability) / child.visits)
+			if best_value is None or value > best_value:
+				best_action = action
+				best_child = child
+				best_value = value
+		return best_action, best_child
+
+# Determinized information set Monte Carlo tree search
+# Every iteration samples the hidden conflict order and the action types rolled in later rounds, all of which share a single tree
+class MCTSAgent:
+	def __init__(self, iterations=None, time_limit=None, processes=1, exploration=0.7, seed=None):
+		if iterations is None and time_limit is None:
+			raise ThumperError("Either a number of iterations or a time limit must be specified")
+		self.iterations = iterations
+		self.time_limit = time_limit
+		self.processes = processes
+		self.exploration = exploration
+		self.random = random.Random(seed)
+		self._executor = None
+
+	# Returns the index into ACTION_DEFINITIONS of the action the current player should perform
+	def select_action(self, game: ThumperGame) -> int:
+		visits = self.get_visits(game)
+		legal_actions = game.get_legal_actions()
+		return max(legal_actions, key=lambda action: visits[action])
+
+	# Runs one tree per process, starting from the same root, and merges the visit counts of the root actions
+	def get_visits(self, game: ThumperGame) -> list[int]:
+		if game.game_ended:
+			raise ThumperError("Unable to search a game that has already ended")
+		snapshot = game.snapshot()
+		seeds = [self.random.getrandbits(64) for _ in range(self.processes)]
+		if self.processes == 1:
+			return run_search(snapshot, self.iterations, self.time_limit, self.exploration, seeds[0])
+		if self._executor is None:
+			self._executor = ProcessPoolExecutor(max_workers=self.processes)
+		futures = [self._executor.submit(run_search, snapshot, self.iterations, self.time_limit, self.exploration, seed) for seed in seeds]
+		visits = len(ACTION_DEFINITIONS) * [0]
+		for future in futures:
+			for action, count in enumerate(future.result()):
+				visits[action] += count
+		return visits
+
+	def close(self) -> None:
+		if self._executor is not None:
+			self._executor.shutdown()
+			self._executor = None
+
+# Runs a single tree search and returns the number of visits of each root action, may be executed in a worker process
+def run_search(snapshot, iterations, time_limit, exploration, seed) -> list[int]:
+	root_game = ThumperGame.from_snapshot(snapshot, seed)
+	root = SearchNode()
+	deadline = None if time_limit is None else time.perf_counter() + time_limit
+	iteration = 0
+	while (iterations is None or iteration < iterations) and (deadline is None or time.perf_counter() < deadline):
+		# All iterations draw from the random number generator of the root so that they roll different action types
+		game = root_game.clone(share_random=True)
+		game.shuffle_hidden_conflicts()
+		_run_iteration(game, root, exploration)
+		iteration += 1
+	visits = len(ACTION_DEFINITIONS) * [0]
+	for action, child in root.children.items():
+		visits[action] = child.visits
+	return visits
+
+def _run_iteration(game, root, exploration) -> None:
+	node = root
+	path = [root]
+	# Selection and expansion
+	while not game.game_ended:
+		legal_actions = game.get_legal_actions()
+		untried_actions = [action for action in legal_actions if action not in node.children]
+		player_index = game.current_player_index
+		if len(untried_actions) > 0:
+			action = game.random.choice(untried_actions)
+			child = SearchNode(player_index)
+			node.children[action] = child
+			for other_action in legal_actions:
+				if other_action in node.children:
+					node.children[other_action].availability += 1
+			game.apply_unchecked(action)
+			path.append(child)
+			break
+		action, node = node.select_child(legal_actions, exploration)
+		game.apply_unchecked(action)
+		path.append(node)
+	# Playout, the actions are drawn from the legal ones so they do not need to be checked again
+	while not game.game_ended:
+		game.apply_unchecked(game.random.choice(game.get_legal_actions()))
+	scores = get_scores(game)
+	for node in path:
+		node.visits += 1
+		if node.player_index is not None:
+			node.score += scores[node.player_index]
+
+def get_scores(game: ThumperGame) -> list[float]:
+	return [RANK_SCORES[rank] for rank in game.get_player_ranks()]
\ No newline at end of file
@@ -1,111 +1,330 @@
-from typing import Final
+from typing import Final, TYPE_CHECKING
+import logging
 import os
-import matplotlib.pyplot as plt
-from matplotlib.ticker import FuncFormatter
-from stable_baselines3.common.logger import Logger
-from .constants import Action
+import threading
+import numpy as np
+from .constants import Constant, Action
+from .action import ACTION_DEFINITIONS
 from .player import ThumperPlayer
-from .env import raw_env
-
-class ThumperGameOutcome:
-	victory_points: int
-	swordmaster: bool
-	palace: bool
-	holtzman_shield: bool
-	spice_harvested: int
-	solari_earned: int
-	win: bool
-	action_counts: dict[Action | None, int]
+from .error import ThumperError
+
+# Matplotlib is only imported when the first plot is rendered, Stable-Baselines3 and the environment are only needed for annotations
+if TYPE_CHECKING:
+	from stable_baselines3.common.logger import Logger
+	from matplotlib.figure import Figure as MatplotlibFigure
+	from .env import raw_env
+	from .archive import GameArchiveWriter
+	from .batch import BatchedThumperGame
+	from .vec_env import ThumperVecEnv, ThumperSubprocVecEnv
+
+_logger: Final[logging.Logger] = logging.getLogger(__name__)
+
+# Actions counted by ThumperStats, None stands for passing
+ACTION_RANGE: Final[list[Action | None]] = list(Action) + [None]
+_ACTION_COLUMNS: Final[dict[Action | None, int]] = {action: i for i, action in enumerate(ACTION_RANGE)}
+# Indexed by the index into ACTION_DEFINITIONS, the index into ACTION_RANGE of its action
+ACTION_RANGE_INDICES: Final[np.ndarray] = np.array([_ACTION_COLUMNS[definition.action_enum] for definition in ACTION_DEFINITIONS], dtype=np.intp)
+
+# Columns of the outcomes stored in GameOutcomeWindow
+class OutcomeField:
+	WIN = 0
+	VICTORY_POINTS = 1
+	# Victory points if the player bought the Swordmaster and 0 otherwise
+	VICTORY_POINTS_SWORDMASTER = 2
+	SWORDMASTER = 3
+	PALACE = 4
+	HOLTZMAN_SHIELD = 5
+	SPICE_HARVESTED = 6
+	SOLARI_EARNED = 7
+	# 0 for the winner
+	RANK = 8
+	# Number of times each action was performed, in the order of ACTION_RANGE
+	ACTION_COUNTS = 9
+	COUNT = ACTION_COUNTS + len(ACTION_RANGE)
+
+# Ring buffer of the outcomes of the most recent games, with one row per game and the columns in OutcomeField
+# The sums of the columns are updated as games are added and evicted, so they never have to be recomputed from the stored games
+class GameOutcomeWindow:
+	size: int
+	outcomes: np.ndarray
+	sums: np.ndarray
+	_count: int
+	_next: int
+
+	def __init__(self, size: int):
+		self.size = size
+		self.outcomes = np.zeros((size, OutcomeField.COUNT), dtype=np.int64)
+		self.sums = np.zeros(OutcomeField.COUNT, dtype=np.int64)
+		self._count = 0
+		self._next = 0
+
+	def __len__(self) -> int:
+		return self._count
+
+	# Stores the outcome, a sequence of OutcomeField.COUNT values, evicting the oldest game if the window is full
+	def add(self, outcome) -> None:
+		row = self.outcomes[self._next]
+		self.sums -= row
+		row[:] = outcome
+		self.sums += row
+		self._next = (self._next + 1) % self.size
+		self._count = min(self._count + 1, self.size)
+
+	# Stores all rows of outcomes, an array of the shape (n, OutcomeField.COUNT), in the time it takes to add n games
+	def add_all(self, outcomes: np.ndarray) -> None:
+		if len(outcomes) >= self.size:
+			self.outcomes[:] = outcomes[-self.size:]
+			self.sums[:] = self.outcomes.sum(axis=0)
+			self._next = 0
+			self._count = self.size
+			return
+		rows = (self._next + np.arange(len(outcomes))) % self.size
+		self.sums -= self.outcomes[rows].sum(axis=0)
+		self.outcomes[rows] = outcomes
+		self.sums += self.outcomes[rows].sum(axis=0)
+		self._next = (self._next + len(outcomes)) % self.size
+		self._count = min(self._count + len(outcomes), self.size)
+
+# Returns the outcomes of all players of the specified games as an array of the shape (len(game_indices), PLAYER_COUNT, OutcomeField.COUNT)
+# action_counts is the number of times each player performed each action, with the shape (len(game_indices), PLAYER_COUNT, len(ACTION_RANGE))
+def get_batch_outcomes(game: "BatchedThumperGame", game_indices: np.ndarray, action_counts: np.ndarray) -> np.ndarray:
+	outcomes = np.zeros((len(game_indices), Constant.PLAYER_COUNT, OutcomeField.COUNT), dtype=np.int32)
+	victory_points = game.victory_points[game_indices]
+	swordmaster = game.swordmaster[game_indices]
+	ranks = game.get_player_ranks(game_indices)
+	outcomes[..., OutcomeField.WIN] = ranks == 0
+	outcomes[..., OutcomeField.VICTORY_POINTS] = victory_points
+	outcomes[..., OutcomeField.VICTORY_POINTS_SWORDMASTER] = np.where(swordmaster, victory_points, 0)
+	outcomes[..., OutcomeField.SWORDMASTER] = swordmaster
+	outcomes[..., OutcomeField.PALACE] = game.palace[game_indices]
+	outcomes[..., OutcomeField.HOLTZMAN_SHIELD] = game.holtzman_shield[game_indices]
+	outcomes[..., OutcomeField.SPICE_HARVESTED] = game.spice_harvested[game_indices]
+	outcomes[..., OutcomeField.SOLARI_EARNED] = game.solari_earned[game_indices]
+	outcomes[..., OutcomeField.RANK] = ranks
+	outcomes[..., OutcomeField.ACTION_COUNTS:] = action_counts
+	return outcomes
+
+# Labels of the actions in ACTION_RANGE in the action frequency plot
+ACTION_LABELS: Final[list[str]] = [
+	# Economic Actions
+	"Construct Palace",
+	"Harvester",
+	"Refinery",
+	"Spice Silo",
+	"Sell Melange",
+	"Secure Contract",
+	# Military actions
+	"Holtzman Shield",
+	"Stone Burner",
+	"Hire Mercenaries",
+	"Quick Strike",
+	"Recruitment Center",
+	"Troop Transports",
+	"Loot Villages",
+	# Political actions
+	"Swordmaster",
+	"Sardaukar",
+	"Audience with Emperor",
+	"Mobilization",
+	"Seek Allies",
+	"Political Maneuvering",
+	# Other
+	"Pass"
+]
+
+# Saves the action frequency plot in a background thread so that rendering it does not stall the training loop
+# Only the most recent request is kept, a request made while a plot is being rendered replaces any earlier one that is still waiting
+# A plot that cannot be saved is logged and skipped, the thread keeps rendering the requests that follow
+class ActionPlotRenderer:
+	_condition: threading.Condition
+	_request: tuple[list[float], str] | None
+	_thread: threading.Thread | None
+	_closed: bool
+	_figure: "MatplotlibFigure | None"
+	_bars: list
 
 	def __init__(self):
-		self.victory_points = 0
-		self.swordmaster = False
-		self.palace = False
-		self.holtzman_shield = False
-		self.spice_harvested = 0
-		self.solari_earned = 0
-		self.win = False
-		self.action_counts = {}
-		for action in ThumperStats.ACTION_RANGE:
-			self.action_counts[action] = 0
+		self._condition = threading.Condition()
+		self._request = None
+		self._thread = None
+		self._closed = False
+		self._figure = None
+		self._bars = []
+
+	# values are the frequencies of the actions in ACTION_RANGE, path is the PNG file to write
+	def submit(self, values: list[float], path: str) -> None:
+		with self._condition:
+			if self._closed:
+				raise ThumperError("Unable to render a plot after the renderer has been closed")
+			self._request = (values, path)
+			if self._thread is None:
+				self._thread = threading.Thread(target=self._run, name="ActionPlotRenderer", daemon=True)
+				self._thread.start()
+			self._condition.notify()
+
+	# Waits for the pending request to be rendered and stops the thread
+	def close(self) -> None:
+		with self._condition:
+			self._closed = True
+			self._condition.notify()
+		if self._thread is not None:
+			self._thread.join()
+			self._thread = None
+
+	def _run(self) -> None:
+		while True:
+			with self._condition:
+				while self._request is None and not self._closed:
+					self._condition.wait()
+				if self._request is None:
+					return
+				values, path = self._request
+				self._request = None
+			try:
+				self._render(values, path)
+			except Exception:
+				_logger.exception(f"Unable to save the action frequency plot to \"{path}\"")
+				# The figure is created again in case the error left it incomplete
+				self._figure = None
+				self._bars = []
+
+	# The figure is created on the first request and its bars are updated for the ones that follow
+	# It does not use pyplot, whose global state must not be accessed from more than one thread
+	def _render(self, values: list[float], path: str) -> None:
+		if self._figure is None:
+			from matplotlib.figure import Figure
+			from matplotlib.ticker import FuncFormatter
+			self._figure = Figure()
+			ax = self._figure.subplots()
+			self._bars = list(ax.bar(ACTION_LABELS, values))
+			ax.set_ylabel("Frequency")
+			ax.yaxis.set_major_formatter(FuncFormatter(lambda y, _: "{:.1%}".format(y)))
+			ax.set_title("Action Frequency")
+			ax.tick_params(axis="x", labelrotation=90)
+			self._figure.tight_layout()
+		else:
+			for bar, value in zip(self._bars, values):
+				bar.set_height(value)
+			ax = self._figure.axes[0]
+			ax.relim()
+			ax.autoscale_view()
+		self._figure.savefig(path, dpi=150)
 
 class ThumperStats:
 	PREFIX: Final[str] = "thumper"
 	GAME_LIMIT: Final[int] = 200
-	ACTION_RANGE: Final[list[Action | None]] = list(Action) + [None]
+	ACTION_RANGE: Final[list[Action | None]] = ACTION_RANGE
 
-	logger: Logger | None
-	_game: ThumperGameOutcome
-	_games: list[ThumperGameOutcome]
+	logger: "Logger | None"
+	_window: GameOutcomeWindow
+	_action_counts: np.ndarray
 	_games_played: int
 	_action_plot_frequency: int
+	_action_plot_renderer: ActionPlotRenderer | None
+	_archive: "GameArchiveWriter | None"
 
-	def __init__(self, action_plot_frequency=250):
+	# The action frequencies are recorded as a histogram every action_plot_frequency games
+	# With save_action_plot they are also saved as action_frequency.png in the directory of the logger
+	# The outcomes of all games are additionally appended to archive if one is specified
+	def __init__(self, action_plot_frequency=250, save_action_plot=True, archive: "GameArchiveWriter | None" = None):
 		self.logger = None
-		self._game = ThumperGameOutcome()
-		self._games = []
+		self._window = GameOutcomeWindow(self.GAME_LIMIT)
+		# Number of times each player performed each action in the current game, indexed by player index and the index into ACTION_RANGE
+		self._action_counts = np.zeros((Constant.PLAYER_COUNT, len(ACTION_RANGE)), dtype=np.int64)
 		self._games_played = 0
 		self._action_plot_frequency = action_plot_frequency
+		self._action_plot_renderer = ActionPlotRenderer() if save_action_plot else None
+		self._archive = archive
 
-	def on_step(self, env: raw_env, index: int) -> None:
-		self._game.action_counts[env.last_action] += 1
+	def on_step(self, env: "raw_env", index: int) -> None:
+		self._action_counts[env.last_player_index, _ACTION_COLUMNS[env.last_action]] += 1
 		last_game_players = env.get_last_game_players()
 		if last_game_players is not None:
-			player = last_game_players[index]
+			player = next(player for player in last_game_players if player.index == index)
 			self._on_game_end(player, last_game_players)
 			if self._games_played % self._action_plot_frequency == 0:
 				self._render_action_plot()
 
+	# Adds the outcomes of the games finished by a vectorized environment created with record_outcomes=True
+	# A single policy plays all players of these games, so each of them counts as a game of its own
+	# It only has to be called when the stats are needed, the outcomes are buffered by the environment in the meantime
+	# Environments only buffer the outcomes of the most recent finished_game_limit games, so games are missing from the archive if it is called less often
+	def on_vec_step(self, env: "ThumperVecEnv | ThumperSubprocVecEnv") -> None:
+		self.add_outcomes(env.get_finished_outcomes())
+
+	# Adds outcomes, an array of the shape (n, OutcomeField.COUNT), to the window and records the stats once
+	# With an archive the rows must contain all players of each game in the order of their indexes, as returned by get_finished_outcomes
+	def add_outcomes(self, outcomes: np.ndarray) -> None:
+		if len(outcomes) == 0:
+			return
+		if self._archive is not None:
+			self._archive_outcomes(outcomes)
+		previous_games_played = self._games_played
+		self._window.add_all(outcomes)
+		self._games_played += len(outcomes)
+		self._record_stats()
+		if self._games_played // self._action_plot_frequency > previous_games_played // self._action_plot_frequency:
+			self._render_action_plot()
+
+	# Waits for the action frequency plot that is being rendered to be saved and writes the games buffered by the archive
+	def close(self) -> None:
+		if self._action_plot_renderer is not None:
+			self._action_plot_renderer.close()
+		if self._archive is not None:
+			self._archive.close()
+
 	def _on_game_end(self, player: ThumperPlayer, last_game_players: list[ThumperPlayer]) -> None:
-		self._game.victory_points = player.victory_points
-		self._game.swordmaster = player.swordmaster
-		self._game.palace = player.palace
-		self._game.holtzman_shield = player.holtzman_shield
-		self._game.spice_harvested = player.spice_harvested
-		self._game.solari_earned = player.solari_earned
+		ranks = Constant.PLAYER_COUNT * [0]
+		for rank, ranked_player in enumerate(last_game_players):
+			ranks[ranked_player.index] = rank
+		outcome = [
+			player is last_game_players[0],
+			player.victory_points,
+			player.victory_points if player.swordmaster else 0,
+			player.swordmaster,
+			player.palace,
+			player.holtzman_shield,
+			player.spice_harvested,
+			player.solari_earned,
+			ranks[player.index]
+		]
+		self._window.add(outcome + self._action_counts.sum(axis=0).tolist())
+		if self._archive is not None:
+			self._archive.add_game(last_game_players, ranks, self._action_counts)
 		self._games_played += 1
-		self._game.win = player is last_game_players[0]
-		self._games.append(self._game)
-		while len(self._games) > self.GAME_LIMIT:
-			self._games.pop(0)
-		self._game = ThumperGameOutcome()
+		self._action_counts[:] = 0
 		self._record_stats()
 
+	def _archive_outcomes(self, outcomes: np.ndarray) -> None:
+		if len(outcomes) % Constant.PLAYER_COUNT != 0:
+			raise ThumperError("The outcomes of all players of each game are required to archive them")
+		games = outcomes.reshape(-1, Constant.PLAYER_COUNT, OutcomeField.COUNT)
+		self._archive.add_games({
+			"victory_points": games[..., OutcomeField.VICTORY_POINTS],
+			"rank": games[..., OutcomeField.RANK],
+			"spice_harvested": games[..., OutcomeField.SPICE_HARVESTED],
+			"solari_earned": games[..., OutcomeField.SOLARI_EARNED],
+			"swordmaster": games[..., OutcomeField.SWORDMASTER],
+			"palace": games[..., OutcomeField.PALACE],
+			"holtzman_shield": games[..., OutcomeField.HOLTZMAN_SHIELD],
+			"action_counts": games[..., OutcomeField.ACTION_COUNTS:]
+		})
+
 	def _record_stats(self):
-		wins = 0
-		victory_points = 0
-		victory_points_swordmaster = 0
-		victory_points_no_swordmaster = 0
-		swordmaster_count = 0
-		palace_count = 0
-		holtzman_shield_count = 0
-		spice_harvested = 0
-		solari_earned = 0
-		games_played = len(self._games)
-		for game in self._games:
-			if game.win:
-				wins += 1
-			victory_points += game.victory_points
-			if game.swordmaster:
-				swordmaster_count += 1
-				victory_points_swordmaster += game.victory_points
-			else:
-				victory_points_no_swordmaster += game.victory_points
-			if game.palace:
-				palace_count += 1
-			if game.holtzman_shield:
-				holtzman_shield_count += 1
-			spice_harvested += game.spice_harvested
-			solari_earned += game.solari_earned
-		win_ratio_percentage = self._get_percentage(wins, games_played)
+		games_played = len(self._window)
+		sums = self._window.sums.tolist()
+		victory_points = sums[OutcomeField.VICTORY_POINTS]
+		victory_points_swordmaster = sums[OutcomeField.VICTORY_POINTS_SWORDMASTER]
+		swordmaster_count = sums[OutcomeField.SWORDMASTER]
+		win_ratio_percentage = self._get_percentage(sums[OutcomeField.WIN], games_played)
 		average_victory_points = victory_points / games_played
 		average_victory_points_swordmaster = self._get_ratio(victory_points_swordmaster, swordmaster_count)
-		average_victory_points_no_swordmaster = self._get_ratio(victory_points_no_swordmaster, games_played - swordmaster_count)
+		average_victory_points_no_swordmaster = self._get_ratio(victory_points - victory_points_swordmaster, games_played - swordmaster_count)
 		swordmaster_percentage = self._get_percentage(swordmaster_count, games_played)
-		palace_percentage = self._get_percentage(palace_count, games_played)
-		holtzman_shield_percentage = self._get_percentage(holtzman_shield_count, games_played)
-		spice_harvested = self._get_ratio(spice_harvested, games_played)
-		solari_earned = self._get_ratio(solari_earned, games_played)
+		palace_percentage = self._get_percentage(sums[OutcomeField.PALACE], games_played)
+		holtzman_shield_percentage = self._get_percentage(sums[OutcomeField.HOLTZMAN_SHIELD], games_played)
+		spice_harvested = self._get_ratio(sums[OutcomeField.SPICE_HARVESTED], games_played)
+		solari_earned = self._get_ratio(sums[OutcomeField.SOLARI_EARNED], games_played)
 		self._record("win_ratio", win_ratio_percentage)
 		self._record("victory_points", average_victory_points)
 		self._record("victory_points_swordmaster", average_victory_points_swordmaster)
@@ -118,55 +337,15 @@ class ThumperStats:
 
 	def _render_action_plot(self) -> None:
 		assert self.logger is not None
-		labels = [
-			# Economic Actions
-			"Construct Palace",
-			"Harvester",
-			"Refinery",
-			"Spice Silo",
-			"Sell Melange",
-			"Secure Contract",
-			# Military actions
-			"Holtzman Shield",
-			"Stone Burner",
-			"Hire Mercenaries",
-			"Quick Strike",
-			"Recruitment Center",
-			"Troop Transports",
-			"Loot Villages",
-			# Political actions
-			"Swordmaster",
-			"Sardaukar",
-			"Audience with Emperor",
-			"Mobilization",
-			"Seek Allies",
-			"Political Maneuvering",
-			# Other
-			"Pass"
-		]
-		values = []
-		action_counts = {}
-		for action in self.ACTION_RANGE:
-			action_counts[action] = 0
-		action_count = 0
-		for game in self._games:
-			for action in game.action_counts:
-				value = game.action_counts[action]
-				action_counts[action] += value
-				action_count += value
-		for action in self.ACTION_RANGE:
-			percentage = self._get_ratio(action_counts[action], action_count, 3)
-			values.append(percentage)
-		figure, ax = plt.subplots()
-		ax.bar(labels, values)
-		ax.set_ylabel("Frequency")
-		ax.yaxis.set_major_formatter(FuncFormatter(lambda y, _: "{:.1%}".format(y)))
-		ax.set_title("Action Frequency")
-		plt.xticks(rotation="vertical")
-		plt.tight_layout()
-		path = os.path.join(self.logger.dir, "action_frequency.png")
-		plt.savefig(path, dpi=150)
-		plt.close()
+		action_counts = self._window.sums[OutcomeField.ACTION_COUNTS:]
+		# Recorded as the indexes into ACTION_RANGE of all actions performed in the window, which TensorBoard shows as a histogram
+		histogram = np.repeat(np.arange(len(ACTION_RANGE)), action_counts)
+		self.logger.record(f"{self.PREFIX}/action_frequency", histogram, exclude=("stdout", "log", "json", "csv"))
+		if self._action_plot_renderer is not None:
+			action_count = int(action_counts.sum())
+			values = [self._get_ratio(count, action_count, 3) or 0 for count in action_counts.tolist()]
+			path = os.path.join(self.logger.dir, "action_frequency.png")
+			self._action_plot_renderer.submit(values, path)
 
 	def _record(self, key, value):
 		assert self.logger is not None
@@ -0,0 +1,60 @@
+from typing import Any
+from .error import ThumperError
+
+# Fixed-size hash table keyed by ThumperGame.get_zobrist_hash
+# Each key maps to a single slot, a colliding entry is only replaced if it was stored by an earlier search or at a depth no greater than the new one
+class TranspositionTable:
+	size: int
+	hits: int
+	misses: int
+	_keys: list[int | None]
+	_depths: list[int]
+	_generations: list[int]
+	_values: list[Any]
+	_generation: int
+	_used: int
+
+	def __init__(self, size: int = 1 << 20):
+		if size < 1:
+			raise ThumperError("The size of a transposition table must be positive")
+		self.size = size
+		self.clear()
+
+	def __len__(self) -> int:
+		return self._used
+
+	def clear(self) -> None:
+		self.hits = 0
+		self.misses = 0
+		self._keys = self.size * [None]
+		self._depths = self.size * [0]
+		self._generations = self.size * [0]
+		self._values = self.size * [None]
+		self._generation = 0
+		self._used = 0
+
+	# Entries from previous searches are kept but can be replaced regardless of their depth
+	def new_search(self) -> None:
+		self._generation += 1
+
+	def lookup(self, key: int, depth: int = 0) -> Any | None:
+		slot = key % self.size
+		if self._keys[slot] == key and self._depths[slot] >= depth:
+			self.hits += 1
+			self._generations[slot] = self._generation
+			return self._values[slot]
+		self.misses += 1
+		return None
+
+	def store(self, key: int, value: Any, depth: int = 0) -> bool:
+		slot = key % self.size
+		stored_key = self._keys[slot]
+		if stored_key is None:
+			self._used += 1
+		elif stored_key != key and self._generations[slot] == self._generation and self._depths[slot] > depth:
+			return False
+		self._keys[slot] = key
+		self._depths[slot] = depth
+		self._generations[slot] = self._generation
+		self._values[slot] = value
+		return True
\ No newline at end of file
@@ -0,0 +1,347 @@
+import os
+import multiprocessing
+import warnings
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Final, Iterable
+import numpy as np
+from gymnasium.spaces import Discrete
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv, VecEnvIndices, VecEnvObs, VecEnvStepReturn
+from .constants import Constant
+from .action import ACTION_COUNT
+from .batch import BatchedThumperGame
+from .error import ThumperError
+from .observation import OBSERVATION_SIZE, get_observation_nvec, write_batch_observations
+from .env import raw_env, Int8MultiDiscrete
+from .stats import ACTION_RANGE, ACTION_RANGE_INDICES, OutcomeField, get_batch_outcomes
+
+# Shape of one row and type of the buffers passed to ThumperVecEnv: observations, terminal observations, action masks, rewards, dones, outcomes and final rewards
+# The outcomes of all players of a game, see OutcomeField, and the rewards its players had not been paid yet are written when it ends
+_BUFFER_LAYOUT: Final[list[tuple[tuple[int, ...], type]]] = [
+	((OBSERVATION_SIZE,), np.int8),
+	((OBSERVATION_SIZE,), np.int8),
+	((ACTION_COUNT,), np.int8),
+	((), np.float32),
+	((), np.bool_),
+	((Constant.PLAYER_COUNT, OutcomeField.COUNT), np.int32),
+	((Constant.PLAYER_COUNT,), np.float32)
+]
+# ThumperSubprocVecEnv additionally shares the actions of each step with its workers
+_SHARED_BUFFER_LAYOUT: Final[list[tuple[tuple[int, ...], type]]] = _BUFFER_LAYOUT + [((), np.int64)]
+
+def _allocate_buffers(num_envs: int) -> tuple[np.ndarray, ...]:
+	return tuple(np.zeros((num_envs,) + shape, dtype=dtype) for shape, dtype in _BUFFER_LAYOUT)
+
+def _get_buffer_size(num_envs: int, shape: tuple[int, ...], dtype: type) -> int:
+	return num_envs * int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+
+def _get_shared_buffers(memories: list[SharedMemory], num_envs: int) -> list[np.ndarray]:
+	return [np.ndarray((num_envs,) + shape, dtype=dtype, buffer=memory.buf) for (shape, dtype), memory in zip(_SHARED_BUFFER_LAYOUT, memories)]
+
+# Shared by the vectorized environments, which write observations, action masks, rewards and dones into arrays of num_envs rows
+# With record_outcomes the outcomes of the games that end are kept until they are retrieved with get_finished_outcomes, for ThumperStats.on_vec_step
+# At most finished_game_limit games are kept, beyond that the oldest ones are dropped and counted in dropped_game_count, with a warning the first time
+class _BaseThumperVecEnv(VecEnv):
+	render_mode: str | None = None
+	dropped_game_count: int
+
+	_observations: np.ndarray
+	_terminal_observations: np.ndarray
+	_action_masks: np.ndarray
+	_rewards: np.ndarray
+	_dones: np.ndarray
+	_outcomes: np.ndarray
+	_final_rewards: np.ndarray
+	_record_outcomes: bool
+	_finished_outcomes: list[np.ndarray]
+	_finished_game_count: int
+	_finished_game_limit: int
+
+	def __init__(self, num_envs: int, record_outcomes: bool = False, finished_game_limit: int = 1 << 16):
+		observation_space = Int8MultiDiscrete(get_observation_nvec())
+		action_space = Discrete(ACTION_COUNT)
+		super().__init__(num_envs, observation_space, action_space)
+		self._record_outcomes = record_outcomes
+		self._finished_outcomes = []
+		self._finished_game_count = 0
+		self._finished_game_limit = finished_game_limit
+		self.dropped_game_count = 0
+
+	# Returns the outcomes of all players of the games that ended since the last call as an array of the shape (n, OutcomeField.COUNT)
+	def get_finished_outcomes(self) -> np.ndarray:
+		if not self._finished_outcomes:
+			return np.zeros((0, OutcomeField.COUNT), dtype=np.int32)
+		outcomes = np.concatenate(self._finished_outcomes)
+		self._finished_outcomes = []
+		self._finished_game_count = 0
+		return outcomes
+
+	# Legal action mask of the current player of each game, for MaskablePPO
+	def action_masks(self) -> np.ndarray:
+		return self._action_masks.copy()
+
+	def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> list[Any]:
+		value = getattr(self, attr_name)
+		return [value for _ in self._get_indices(indices)]
+
+	def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+		setattr(self, attr_name, value)
+
+	# Methods returning one row per game, such as action_masks, return the rows of the requested games
+	def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs) -> list[Any]:
+		result = getattr(self, method_name)(*method_args, **method_kwargs)
+		indices = list(self._get_indices(indices))
+		if isinstance(result, np.ndarray) and result.ndim > 0 and len(result) == self.num_envs:
+			return [result[i] for i in indices]
+		return [result for _ in indices]
+
+	def env_is_wrapped(self, wrapper_class: type, indices: VecEnvIndices = None) -> list[bool]:
+		return [False for _ in self._get_indices(indices)]
+
+	def _get_infos(self) -> list[dict[str, Any]]:
+		infos: list[dict[str, Any]] = [{} for _ in range(self.num_envs)]
+		for game_index in np.flatnonzero(self._dones):
+			infos[game_index]["terminal_observation"] = self._terminal_observations[game_index].copy()
+			infos[game_index]["final_rewards"] = self._final_rewards[game_index].copy()
+			infos[game_index]["TimeLimit.truncated"] = False
+		return infos
+
+	# The outcomes were written to the buffer by the games themselves, or by the workers, so this does not involve any communication
+	def _collect_outcomes(self) -> None:
+		if self._record_outcomes:
+			ended = np.flatnonzero(self._dones)
+			if len(ended) > 0:
+				self._finished_outcomes.append(self._outcomes[ended].reshape(-1, OutcomeField.COUNT))
+				self._finished_game_count += len(ended)
+				if self._finished_game_count > self._finished_game_limit:
+					self._drop_finished_outcomes(self._finished_game_count - self._finished_game_limit)
+
+	def _drop_finished_outcomes(self, game_count: int) -> None:
+		if self.dropped_game_count == 0:
+			warnings.warn(f"More than {self._finished_game_limit} games ended without their outcomes being retrieved with get_finished_outcomes, the outcomes of the oldest games are dropped", RuntimeWarning)
+		self.dropped_game_count += game_count
+		self._finished_game_count -= game_count
+		rows = game_count * Constant.PLAYER_COUNT
+		while rows > 0:
+			outcomes = self._finished_outcomes[0]
+			if len(outcomes) <= rows:
+				self._finished_outcomes.pop(0)
+				rows -= len(outcomes)
+			else:
+				self._finished_outcomes[0] = outcomes[rows:]
+				rows = 0
+
+	def _get_indices(self, indices: VecEnvIndices) -> Iterable[int]:
+		if indices is None:
+			return range(self.num_envs)
+		elif isinstance(indices, int):
+			return [indices]
+		return indices
+
+# Stable-Baselines3 vectorized environment playing num_envs games at once on a BatchedThumperGame
+# Each step performs one action in every game on behalf of the player whose turn it is, so a single policy controls all players
+# Observations and action masks are written into preallocated int8 arrays of the shapes (num_envs, OBSERVATION_SIZE) and (num_envs, ACTION_COUNT)
+# The buffers are overwritten by the next step, so copies are returned, as SB3 stores the observations and dones of a step only after the next one
+# Games that end are reset automatically, with the final observation stored in the "terminal_observation" entry of their info
+# Rewards are paid like the rewards of raw_env, each player receives the rewards they earned since their previous action along with their next one
+# The rewards of the other players that are still pending when a game ends, indexed by player index, are stored in the "final_rewards" entry of its info
+class ThumperVecEnv(_BaseThumperVecEnv):
+	game: BatchedThumperGame
+	_actions: np.ndarray | None
+	_end_of_game_rewards: bool
+	_rank_rewards: np.ndarray
+	_action_counts: np.ndarray
+	_pending_rewards: np.ndarray
+
+	# buffers are the arrays (observations, terminal observations, action masks, rewards, dones, outcomes, final rewards) to write into, which are allocated if not specified
+	def __init__(self, num_envs: int, end_of_game_rewards: bool = False, seed: int | None = None, buffers: tuple[np.ndarray, ...] | None = None, record_outcomes: bool = False, finished_game_limit: int = 1 << 16):
+		super().__init__(num_envs, record_outcomes, finished_game_limit)
+		self.game = BatchedThumperGame(num_envs)
+		if buffers is None:
+			buffers = _allocate_buffers(num_envs)
+		self._observations, self._terminal_observations, self._action_masks, self._rewards, self._dones, self._outcomes, self._final_rewards = buffers
+		# Rewards each player earned since their previous action, indexed by game and player index
+		self._pending_rewards = np.zeros((num_envs, Constant.PLAYER_COUNT), dtype=np.float32)
+		# Number of times each player performed each action in the current game, indexed by game, player index and the index into ACTION_RANGE
+		self._action_counts = np.zeros((num_envs, Constant.PLAYER_COUNT, len(ACTION_RANGE)), dtype=np.int32)
+		self._actions = None
+		self._end_of_game_rewards = end_of_game_rewards
+		self._rank_rewards = np.array(raw_env.RANK_REWARDS, dtype=np.float32)
+		if seed is not None:
+			self.seed(seed)
+
+	def reset(self) -> VecEnvObs:
+		seeds = None if any(seed is None for seed in self._seeds) else self._seeds
+		self._reset_games(seeds)
+		self._reset_seeds()
+		self.reset_infos = [{} for _ in range(self.num_envs)]
+		return self._observations.copy()
+
+	def step_async(self, actions: np.ndarray) -> None:
+		self._actions = np.asarray(actions, dtype=np.intp).reshape(self.num_envs)
+
+	def step_wait(self) -> VecEnvStepReturn:
+		if self._actions is None:
+			raise ThumperError("step_async must be called before step_wait")
+		actions = self._actions
+		self._actions = None
+		self._step(actions)
+		self._collect_outcomes()
+		return self._observations.copy(), self._rewards.copy(), self._dones.copy(), self._get_infos()
+
+	def close(self) -> None:
+		pass
+
+	def _reset_games(self, seeds: list[int] | None) -> None:
+		self.game.reset(seeds)
+		self._action_counts[:] = 0
+		self._pending_rewards[:] = 0
+		self._update_buffers()
+
+	# Performs the actions, writes the results into the buffers and resets the games that ended
+	def _step(self, actions: np.ndarray) -> None:
+		games = np.arange(self.num_envs)
+		if not self._action_masks[games, actions].all():
+			raise ThumperError("Tried to perform an action that is not available")
+		current = self.game.current_player_index.copy()
+		self._action_counts[games, current, ACTION_RANGE_INDICES[actions]] += 1
+		self.game.step_unchecked(actions)
+		np.copyto(self._dones, self.game.game_ended)
+		ended = np.flatnonzero(self._dones)
+		if self._end_of_game_rewards:
+			if len(ended) > 0:
+				self._pending_rewards[ended] += self._rank_rewards[self.game.get_player_ranks(ended)]
+		else:
+			# All players are rewarded after each action, like ThumperPlayer.get_reward, where only gains update the previous victory points
+			victory_points = self.game.victory_points
+			self._pending_rewards += victory_points - self.game.previous_victory_points
+			np.maximum(self.game.previous_victory_points, victory_points, out=self.game.previous_victory_points)
+		players = (games, current)
+		self._rewards[:] = self._pending_rewards[players]
+		self._pending_rewards[players] = 0
+		if len(ended) > 0:
+			self._final_rewards[ended] = self._pending_rewards[ended]
+			self._pending_rewards[ended] = 0
+			# The final observation is made from the perspective of the player who ended the game
+			write_batch_observations(self.game, self._terminal_observations, current)
+			self._outcomes[ended] = get_batch_outcomes(self.game, ended, self._action_counts[ended])
+			self._action_counts[ended] = 0
+			self.game.reset_games(ended)
+		self._update_buffers()
+
+	def _update_buffers(self) -> None:
+		write_batch_observations(self.game, self._observations)
+		np.copyto(self._action_masks, self.game.legal_action_mask())
+
+# Like ThumperVecEnv but the games are split into contiguous slices, each of which is played by a ThumperVecEnv in a worker process
+# The workers write directly into arrays in shared memory and the actions are passed the same way
+# Only short commands and acknowledgements are sent through the pipes, so no observations or masks are pickled
+# The results are copied out of shared memory before they are returned, since the workers overwrite them on the next step
+class ThumperSubprocVecEnv(_BaseThumperVecEnv):
+	_memories: list[SharedMemory]
+	_actions: np.ndarray
+	_bounds: list[int]
+	_connections: list[Connection]
+	_processes: list[multiprocessing.Process]
+	_waiting: bool
+	_closed: bool
+
+	def __init__(self, num_envs: int, n_workers: int | None = None, end_of_game_rewards: bool = False, seed: int | None = None, start_method: str | None = None, record_outcomes: bool = False, finished_game_limit: int = 1 << 16):
+		super().__init__(num_envs, record_outcomes, finished_game_limit)
+		if n_workers is None:
+			n_workers = min(os.cpu_count() or 1, num_envs)
+		if n_workers < 1 or n_workers > num_envs:
+			raise ThumperError("The number of workers must be between 1 and the number of games")
+		self._memories = [SharedMemory(create=True, size=max(_get_buffer_size(num_envs, shape, dtype), 1)) for shape, dtype in _SHARED_BUFFER_LAYOUT]
+		self._observations, self._terminal_observations, self._action_masks, self._rewards, self._dones, self._outcomes, self._final_rewards, self._actions = _get_shared_buffers(self._memories, num_envs)
+		if start_method is None:
+			# Same default as SubprocVecEnv, forking a process that has already started threads is not safe
+			start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+		context = multiprocessing.get_context(start_method)
+		names = [memory.name for memory in self._memories]
+		self._bounds = [num_envs * i // n_workers for i in range(n_workers + 1)]
+		self._connections = []
+		self._processes = []
+		for start, end in zip(self._bounds[:-1], self._bounds[1:]):
+			connection, worker_connection = context.Pipe()
+			process = context.Process(target=_run_worker, args=(worker_connection, names, num_envs, start, end, end_of_game_rewards), daemon=True)
+			process.start()
+			worker_connection.close()
+			self._connections.append(connection)
+			self._processes.append(process)
+		self._waiting = False
+		self._closed = False
+		if seed is not None:
+			self.seed(seed)
+
+	def reset(self) -> VecEnvObs:
+		seeds = None if any(seed is None for seed in self._seeds) else self._seeds
+		for connection, start, end in zip(self._connections, self._bounds[:-1], self._bounds[1:]):
+			connection.send(("reset", None if seeds is None else seeds[start:end]))
+		self._receive()
+		self._reset_seeds()
+		self.reset_infos = [{} for _ in range(self.num_envs)]
+		return self._observations.copy()
+
+	def step_async(self, actions: np.ndarray) -> None:
+		np.copyto(self._actions, np.asarray(actions).reshape(self.num_envs), casting="unsafe")
+		for connection in self._connections:
+			connection.send(("step", None))
+		self._waiting = True
+
+	def step_wait(self) -> VecEnvStepReturn:
+		self._receive()
+		self._collect_outcomes()
+		return self._observations.copy(), self._rewards.copy(), self._dones.copy(), self._get_infos()
+
+	def close(self) -> None:
+		if self._closed:
+			return
+		if self._waiting:
+			self._receive()
+		for connection in self._connections:
+			connection.send(("close", None))
+		for process in self._processes:
+			process.join()
+		for connection in self._connections:
+			connection.close()
+		# The arrays must be released before the shared memory can be closed
+		self._observations = self._terminal_observations = self._action_masks = self._rewards = self._dones = self._outcomes = self._final_rewards = self._actions = None
+		for memory in self._memories:
+			memory.close()
+			memory.unlink()
+		self._closed = True
+
+	def _receive(self) -> None:
+		errors = [connection.recv() for connection in self._connections]
+		self._waiting = False
+		for error in errors:
+			if error is not None:
+				raise error
+
+def _run_worker(connection: Connection, names: list[str], num_envs: int, start: int, end: int, end_of_game_rewards: bool) -> None:
+	memories = [SharedMemory(name=name) for name in names]
+	buffers = [buffer[start:end] for buffer in _get_shared_buffers(memories, num_envs)]
+	actions = buffers.pop()
+	env = ThumperVecEnv(end - start, end_of_game_rewards, buffers=tuple(buffers))
+	try:
+		while True:
+			command, data = connection.recv()
+			if command == "close":
+				break
+			try:
+				if command == "step":
+					env._step(actions.astype(np.intp))
+				elif command == "reset":
+					env._reset_games(data)
+				else:
+					raise ThumperError(f"Unknown command \"{command}\"")
+				connection.send(None)
+			except ThumperError as error:
+				connection.send(error)
+	except EOFError:
+		pass
+	finally:
+		del env, buffers, actions
+		for memory in memories:
+			memory.close()
\ No newline at end of file
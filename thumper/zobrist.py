@@ -0,0 +1,41 @@
+import random
+from typing import Final
+from .constants import Constant, Action
+from .conflict import CONFLICT_REWARDS
+
+class ZobristField:
+	SPICE = 0
+	SOLARI = 1
+	TROOPS_GARRISON = 2
+	TROOPS_DEPLOYED = 3
+	INFLUENCE = 4
+	SWORDMASTER = 5
+	PALACE = 6
+	HOLTZMAN_SHIELD = 7
+	AGENTS_LEFT = 8
+	CONFLICT_VICTORY_POINTS = 9
+	# Number of actions of each action type, offset by ActionType.value - 1
+	ACTION_TYPES = 10
+	COUNT = 13
+
+# Keys are generated from a fixed seed so that hashes are stable across processes
+ZOBRIST_SEED: Final[int] = 0x7468756d706572
+# Values are reduced modulo the number of keys per field, which only matters for values that are never reached in practice
+VALUE_MASK: Final[int] = 63
+
+_random = random.Random(ZOBRIST_SEED)
+
+def _get_keys(count: int) -> list[int]:
+	return [_random.getrandbits(64) for _ in range(count)]
+
+# Indexed by player index, ZobristField and value
+PLAYER_KEYS: Final[list[list[list[int]]]] = [[_get_keys(VALUE_MASK + 1) for _ in range(ZobristField.COUNT)] for _ in range(Constant.PLAYER_COUNT)]
+ROUND_KEYS: Final[list[int]] = _get_keys(Constant.MAX_ROUNDS + 1)
+FIRST_PLAYER_KEYS: Final[list[int]] = _get_keys(Constant.PLAYER_COUNT)
+CURRENT_PLAYER_KEYS: Final[list[int]] = _get_keys(Constant.PLAYER_COUNT)
+SPICE_IN_SILO_KEYS: Final[list[int]] = _get_keys(Constant.MAX_SPICE_SILO + 1)
+GAME_ENDED_KEY: Final[int] = _get_keys(1)[0]
+# Included in the hash while the action is still available in the current round
+ACTION_KEYS: Final[dict[Action, int]] = {action: key for action, key in zip(Action, _get_keys(len(Action)))}
+# Indexed by round index and conflict ID
+CONFLICT_KEYS: Final[list[list[int]]] = [_get_keys(len(CONFLICT_REWARDS) + 1) for _ in range(Constant.MAX_ROUNDS)]
\ No newline at end of file